@@ -3,7 +3,7 @@ from .models import Cluster, Machine, Camera
 
 @admin.register(Cluster)
 class ClusterAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name')  # Display cluster ID and name in the admin list view
+    list_display = ('id', 'name', 'priority')  # Display cluster ID, name and load priority in the admin list view
     search_fields = ('name',)  # Enable searching by cluster name
     ordering = ('name',)  # Order clusters by name in ascending order
 
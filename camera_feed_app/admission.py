@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from .encoder import ENCODE_WORKERS
+from .hub import (
+    DEFAULT_JPEG_QUALITY,
+    CameraHub,
+    get_running_hub,
+    ingest_available,
+    release_idle_hub,
+    running_hubs,
+)
+from .metrics import counter, histogram, histograms
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Camera streams decoded at once in this process; None for no limit
+MAX_DECODERS = getattr(settings, 'CAMERA_MAX_DECODERS', 4 * (os.cpu_count() or 1))
+
+# Share of the encode pool's time past which new stream variants are not
+# started; None for no limit
+MAX_ENCODE_LOAD = getattr(settings, 'CAMERA_MAX_ENCODE_LOAD', 0.9)
+
+# Seconds a new stream waits for capacity before it is turned away
+ADMISSION_QUEUE_SECONDS = getattr(settings, 'CAMERA_ADMISSION_QUEUE_SECONDS', 5)
+
+# New streams waiting at once; any more are turned away straight away
+ADMISSION_QUEUE_SIZE = getattr(settings, 'CAMERA_ADMISSION_QUEUE_SIZE', 16)
+
+# Seconds clients are told to wait before retrying a rejected stream
+ADMISSION_RETRY_AFTER = getattr(settings, 'CAMERA_ADMISSION_RETRY_AFTER', 10)
+
+# Seconds between two capacity checks of a waiting stream
+POLL_INTERVAL = 0.25
+
+# Seconds an admitted stream holds its decoder before its hub has started
+RESERVATION_SECONDS = 10
+
+# Shortest window the encode load is measured over
+LOAD_WINDOW_SECONDS = 1
+
+REASON_DECODERS = 'decoders'
+REASON_ENCODE = 'encode'
+REASON_QUEUE = 'queue'
+
+
+class StreamRejected(Exception):
+    """
+    Raised when a node has no capacity left for a new stream.
+    """
+    def __init__(self, reason, retry_after):
+        super().__init__(f"No capacity for a new stream ({reason}).")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Decides whether a new viewer may start streaming.
+
+    A viewer of a camera stream nobody is decoding needs one of max_decoders
+    decoder slots; one asking for a variant nobody is being sent needs the
+    encode pool below max_encode_load. Viewers of what is already being
+    produced cost neither and always get in, so running streams never lose
+    quality to new ones. Viewers short of capacity wait up to queue_seconds
+    for it, at most queue_size at a time, and are then turned away.
+    """
+    def __init__(
+        self,
+        max_decoders=MAX_DECODERS,
+        max_encode_load=MAX_ENCODE_LOAD,
+        queue_seconds=ADMISSION_QUEUE_SECONDS,
+        queue_size=ADMISSION_QUEUE_SIZE,
+        retry_after=ADMISSION_RETRY_AFTER,
+        encode_workers=ENCODE_WORKERS,
+    ):
+        self.max_decoders = max_decoders
+        self.max_encode_load = max_encode_load
+        self.queue_seconds = queue_seconds
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.encode_workers = encode_workers
+        self.waiting = 0
+        self.wait_seconds = histogram('stream_admission_wait_seconds')
+        self._reserved = {}  # hub key -> reserved until
+        self._load = 0.0
+        self._load_sample = None  # (taken at, encode seconds so far)
+        self._lock = threading.Lock()
+
+    def admit(self, camera_id, profile, quality=DEFAULT_JPEG_QUALITY, width=None):
+        """
+        Return once the stream may start, or raise StreamRejected.
+        """
+        for delay in self._attempts(camera_id, profile, quality, width):
+            time.sleep(delay)
+
+    async def admit_async(self, camera_id, profile, quality=DEFAULT_JPEG_QUALITY, width=None):
+        """
+        Like admit(), without holding a thread while the stream waits.
+        """
+        for delay in self._attempts(camera_id, profile, quality, width):
+            await asyncio.sleep(delay)
+
+    def cancel(self, camera_id, profile):
+        """
+        Give back the decoder of an admitted stream that will not start.
+        """
+        with self._lock:
+            self._reserved.pop((camera_id, profile), None)
+
+    def _attempts(self, camera_id, profile, quality, width):
+        # Yields the delays to wait between capacity checks
+        started = time.monotonic()
+        reason = self._try_admit(camera_id, profile, quality, width)
+        if reason is None:
+            self._decided('admitted', 'none')
+            return
+
+        with self._lock:
+            full = self.waiting >= self.queue_size
+            if not full:
+                self.waiting += 1
+        if full:
+            self._reject(camera_id, REASON_QUEUE)
+        try:
+            while time.monotonic() - started < self.queue_seconds:
+                yield POLL_INTERVAL
+                reason = self._try_admit(camera_id, profile, quality, width)
+                if reason is None:
+                    self.wait_seconds.observe(time.monotonic() - started)
+                    self._decided('queued', 'none')
+                    return
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        self._reject(camera_id, reason)
+
+    def _try_admit(self, camera_id, profile, quality, width):
+        """
+        Admit the stream if there is capacity for it, reserving its decoder
+        when it needs one; otherwise return what it is short of.
+        """
+        key = (camera_id, profile)
+        hub = get_running_hub(camera_id, profile)
+        needs_decoder = hub is None and not ingest_available(camera_id, profile)
+        new_variant = hub is None or not any(
+            subscriber.quality == quality and subscriber.width == width
+            for subscriber in list(hub.subscribers)
+        )
+
+        if new_variant and self.max_encode_load is not None and self.encode_load() > self.max_encode_load:
+            return REASON_ENCODE
+        if not needs_decoder or self.max_decoders is None:
+            return None
+
+        if self.decoders_in_use() >= self.max_decoders and not release_idle_hub():
+            return REASON_DECODERS
+        with self._lock:
+            # Checked again under the lock, so two streams cannot both take
+            # the last decoder
+            if key not in self._reserved and self._decoders_in_use() >= self.max_decoders:
+                return REASON_DECODERS
+            self._reserved[key] = time.monotonic() + RESERVATION_SECONDS
+        return None
+
+    def decoders_in_use(self):
+        with self._lock:
+            return self._decoders_in_use()
+
+    def _decoders_in_use(self):
+        # Callers hold the lock
+        decoding = {
+            hub.key for hub in running_hubs() if isinstance(hub, CameraHub) and hub.decodes
+        }
+        now = time.monotonic()
+        for key, until in list(self._reserved.items()):
+            # A reservation ends once its hub exists, or if it never starts
+            if key in decoding or until <= now:
+                del self._reserved[key]
+        return len(decoding) + len(self._reserved)
+
+    def encode_load(self):
+        """
+        Share of the encode pool's time spent resizing and encoding, over the
+        window since the previous measurement.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._load_sample is not None and now - self._load_sample[0] < LOAD_WINDOW_SECONDS:
+                return self._load
+        busy = sum(
+            found.sum for name, labels, found in histograms()
+            if name in ('stream_resize_seconds', 'stream_encode_seconds')
+        )
+        with self._lock:
+            if self._load_sample is not None:
+                taken_at, previous = self._load_sample
+                self._load = (busy - previous) / (now - taken_at) / self.encode_workers
+            self._load_sample = (now, busy)
+            return self._load
+
+    def stats(self):
+        return {
+            "decoders_in_use": self.decoders_in_use(),
+            "max_decoders": self.max_decoders,
+            "encode_load": round(self.encode_load(), 3),
+            "max_encode_load": self.max_encode_load,
+            "waiting": self.waiting,
+        }
+
+    def _decided(self, decision, reason):
+        counter('stream_admissions_total', decision=decision, reason=reason).inc()
+
+    def _reject(self, camera_id, reason):
+        self._decided('rejected', reason)
+        logger.warning(f"Turned away a new stream of camera {camera_id}: no {reason} capacity")
+        raise StreamRejected(reason, self.retry_after)
+
+
+# Process-wide controller shared by the stream views
+admission = AdmissionController()
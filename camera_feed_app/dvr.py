@@ -0,0 +1,272 @@
+import functools
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import deque
+from django.conf import settings
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Seconds of recent video kept per camera for instant replay; 0 disables it
+DVR_SECONDS = getattr(settings, 'CAMERA_DVR_SECONDS', 60)
+
+# Frames per second recorded into the replay buffer
+DVR_FPS = getattr(settings, 'CAMERA_DVR_FPS', 5)
+
+# JPEG quality and width of recorded frames
+DVR_QUALITY = getattr(settings, 'CAMERA_DVR_QUALITY', 80)
+DVR_WIDTH = getattr(settings, 'CAMERA_DVR_WIDTH', 1280)
+
+# Bytes of JPEGs per camera kept in RAM before older ones spill to disk
+DVR_MAX_BYTES = getattr(settings, 'CAMERA_DVR_MAX_BYTES', 32 * 1024 * 1024)
+
+# Bytes of spilled JPEGs per camera; the oldest frames go first beyond this
+DVR_MAX_DISK_BYTES = getattr(settings, 'CAMERA_DVR_MAX_DISK_BYTES', 256 * 1024 * 1024)
+
+# Size of one memory-mapped spill file and the directory they are made in
+DVR_SEGMENT_BYTES = getattr(settings, 'CAMERA_DVR_SEGMENT_BYTES', 16 * 1024 * 1024)
+DVR_SPILL_DIR = getattr(settings, 'CAMERA_DVR_SPILL_DIR', None) or tempfile.gettempdir()
+
+# Hubs record only while this is set. The ingest daemon turns it off, since
+# the web workers reading its frames record them themselves.
+recording = DVR_SECONDS > 0
+
+
+class _Segment:
+    """
+    A memory-mapped file that spilled JPEGs are appended to.
+    """
+    def __init__(self, size):
+        fd, self.path = tempfile.mkstemp(prefix='camera-dvr-', suffix='.seg', dir=DVR_SPILL_DIR)
+        try:
+            os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        try:
+            # The mapping keeps the data; nothing is left behind after a crash
+            os.unlink(self.path)
+            self.path = None
+        except OSError:
+            pass  # Mapped files cannot be deleted on Windows; done in close()
+        self.size = size
+        self.used = 0
+
+    def append(self, jpeg):
+        """
+        Copy jpeg into the segment and return its offset, or None if full.
+        """
+        offset = self.used
+        if offset + len(jpeg) > self.size:
+            return None
+        self.map[offset:offset + len(jpeg)] = jpeg
+        self.used += len(jpeg)
+        return offset
+
+    def close(self):
+        self.map.close()
+        if self.path is not None:
+            os.unlink(self.path)
+
+
+class ReplayBuffer:
+    """
+    Rolling record of one camera's recent frames as timestamped JPEGs.
+
+    Frames are held in RAM up to max_bytes; beyond that the oldest are
+    moved to memory-mapped segment files, which the OS can page out.
+    Anything older than seconds, or past max_disk_bytes, is dropped.
+    """
+    def __init__(
+        self,
+        camera_id,
+        seconds=DVR_SECONDS,
+        fps=DVR_FPS,
+        quality=DVR_QUALITY,
+        width=DVR_WIDTH,
+        max_bytes=DVR_MAX_BYTES,
+        max_disk_bytes=DVR_MAX_DISK_BYTES,
+    ):
+        self.camera_id = camera_id
+        self.seconds = seconds
+        self.quality = quality
+        self.width = width
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.min_interval = 1.0 / fps
+        # Entries are [timestamp, data, counted bytes]. data is the JPEG in
+        # RAM, or (segment, offset, length) once spilled. A static scene
+        # repeats one JPEG, which is only counted and spilled once.
+        self._ram = deque()
+        self._spilled = deque()
+        self._segments = deque()
+        self._last_spill = (None, None)  # (JPEG, its location) last spilled
+        self.ram_bytes = 0
+        self._next_due = 0
+        self._lock = threading.Lock()
+
+    @property
+    def disk_bytes(self):
+        return sum(segment.size for segment in self._segments)
+
+    def wants(self, timestamp):
+        return timestamp >= self._next_due
+
+    def offer(self, frame, request_encode):
+        """
+        Record frame if it is due at the recording rate. request_encode is
+        the hub's, so the encode is shared with viewers of the same variant.
+        """
+        with self._lock:
+            if frame.timestamp < self._next_due:
+                return
+            self._next_due = max(
+                self._next_due + self.min_interval,
+                frame.timestamp + self.min_interval / 2,
+            )
+        future = request_encode(frame, self.quality, self.width)
+        future.add_done_callback(functools.partial(self._encoded, frame.timestamp))
+
+    def _encoded(self, timestamp, future):
+        try:
+            self.append(timestamp, future.result().jpeg)
+        except Exception as e:
+            logger.error(f"Error recording camera {self.camera_id}: {e}")
+
+    def append(self, timestamp, jpeg):
+        with self._lock:
+            last = self._ram[-1] if self._ram else None
+            if last is not None and timestamp <= last[0]:
+                return  # Encodes may finish out of order; keep time moving forward
+            counted = 0 if last is not None and last[1] is jpeg else len(jpeg)
+            self._ram.append([timestamp, jpeg, counted])
+            self.ram_bytes += counted
+            while self.ram_bytes > self.max_bytes and len(self._ram) > 1:
+                self._spill()
+            self._trim(timestamp - self.seconds)
+
+    def _pop(self, entries):
+        entry = entries.popleft()
+        if entries and entries[0][1] is entry[1]:
+            # The next entry repeats this JPEG and now owns its bytes
+            entries[0][2], entry[2] = entry[2], 0
+        return entry
+
+    def _spill(self):
+        entry = self._pop(self._ram)
+        self.ram_bytes -= entry[2]
+        jpeg = entry[1]
+        spilled_jpeg, location = self._last_spill
+        if spilled_jpeg is not jpeg:
+            segment = self._segments[-1] if self._segments else None
+            offset = segment.append(jpeg) if segment is not None else None
+            if offset is None:
+                segment = _Segment(max(DVR_SEGMENT_BYTES, len(jpeg)))
+                self._segments.append(segment)
+                offset = segment.append(jpeg)
+            location = (segment, offset, len(jpeg))
+            self._last_spill = (jpeg, location)
+        self._spilled.append([entry[0], location, 0])
+
+        while self.disk_bytes > self.max_disk_bytes and len(self._segments) > 1:
+            oldest = self._segments[0]
+            while self._spilled and self._spilled[0][1][0] is oldest:
+                self._spilled.popleft()
+            self._release_segments()
+
+    def _trim(self, cutoff):
+        while self._spilled and self._spilled[0][0] < cutoff:
+            self._spilled.popleft()
+        while self._ram and self._ram[0][0] < cutoff:
+            self.ram_bytes -= self._pop(self._ram)[2]
+        self._release_segments()
+
+    def _release_segments(self):
+        # Segments fill in time order, so only the oldest can become unused
+        while self._segments:
+            oldest = self._segments[0]
+            if self._spilled and self._spilled[0][1][0] is oldest:
+                break
+            self._segments.popleft()
+            oldest.close()
+            if self._last_spill[1] is not None and self._last_spill[1][0] is oldest:
+                self._last_spill = (None, None)
+
+    def _read(self, data):
+        if isinstance(data, bytes):
+            return data
+        segment, offset, length = data
+        with self._lock:
+            if segment.map.closed:
+                return None  # Aged out while it was being replayed
+            return segment.map[offset:offset + length]
+
+    def frames_since(self, since):
+        """
+        Yield (timestamp, jpeg) for every recorded frame from since on,
+        oldest first. Frames are read lazily, as the caller gets to them.
+        """
+        with self._lock:
+            if self._ram:
+                self._trim(self._ram[-1][0] - self.seconds)
+            entries = [
+                (entry[0], entry[1])
+                for entries in (self._spilled, self._ram)
+                for entry in entries
+                if entry[0] >= since
+            ]
+        for timestamp, data in entries:
+            jpeg = self._read(data)
+            if jpeg is not None:
+                yield timestamp, jpeg
+
+    def latest(self):
+        """
+        Return (timestamp, jpeg) of the newest recorded frame, or None.
+        """
+        with self._lock:
+            if not self._ram:
+                return None
+            return self._ram[-1][0], self._ram[-1][1]
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._spilled) + len(self._ram)
+            oldest = (self._spilled or self._ram or [[None]])[0][0]
+            return {
+                "frames": entries,
+                "ram_bytes": self.ram_bytes,
+                "disk_bytes": self.disk_bytes,
+                "oldest": oldest,
+                "newest": self._ram[-1][0] if self._ram else None,
+            }
+
+
+# Process-wide replay buffers, keyed by camera ID. They outlive the hubs
+# feeding them, so a stream that just stopped can still be replayed.
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(camera_id):
+    with _buffers_lock:
+        buffer = _buffers.get(camera_id)
+        if buffer is None:
+            buffer = _buffers[camera_id] = ReplayBuffer(camera_id)
+        return buffer
+
+
+def find_buffer(camera_id):
+    """
+    Return the camera's replay buffer, or None if it was never recorded.
+    """
+    with _buffers_lock:
+        return _buffers.get(camera_id)
+
+
+def all_buffers():
+    with _buffers_lock:
+        return list(_buffers.values())
@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from django.conf import settings
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Encoder threads; OpenCV releases the GIL while encoding, so one per core
+ENCODE_WORKERS = getattr(settings, 'CAMERA_ENCODE_WORKERS', None) or os.cpu_count()
+
+
+class EncodePool:
+    """
+    Runs JPEG encodes for many cameras in parallel on a thread pool.
+
+    Work is queued per key (a hub) and each key's tasks run one at a time
+    in submission order, so frames of one camera are never encoded out of
+    order. Keys take turns, one task each, so a busy camera cannot starve
+    the others.
+    """
+    def __init__(self, workers=ENCODE_WORKERS):
+        self.workers = workers
+        self.completed = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jpeg-encode")
+        self._lanes = {}  # key -> deque of (future, fn, args)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        """
+        Queue fn(*args) behind the earlier work for key. Returns a Future.
+        """
+        future = Future()
+        with self._lock:
+            self._pending += 1
+            lane = self._lanes.get(key)
+            idle = lane is None
+            if idle:
+                lane = self._lanes[key] = deque()
+            lane.append((future, fn, args))
+        if idle:
+            self._executor.submit(self._run_next, key)
+        return future
+
+    def queue_depth(self):
+        """
+        Encodes queued or running.
+        """
+        return self._pending
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _run_next(self, key):
+        with self._lock:
+            future, fn, args = self._lanes[key].popleft()
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+            if self._lanes[key]:
+                more = True
+            else:
+                del self._lanes[key]
+                more = False
+        if more:
+            # Back of the queue, behind the other cameras' work
+            self._executor.submit(self._run_next, key)
+
+
+# Process-wide pool used by every hub
+encode_pool = EncodePool()
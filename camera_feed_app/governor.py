@@ -0,0 +1,180 @@
+import logging
+import os
+import resource
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from .encoder import ENCODE_WORKERS, encode_pool
+from .hub import CameraHub, running_hubs
+from .metrics import counter
+from .models import Camera
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Run the load governor in this process
+GOVERNOR_ENABLED = getattr(settings, 'CAMERA_GOVERNOR', True)
+
+# Seconds between two load samples, and so between two steps
+GOVERNOR_INTERVAL = getattr(settings, 'CAMERA_GOVERNOR_INTERVAL', 2)
+
+# Process CPU, as a share of all cores, above which streams are stepped down
+GOVERNOR_CPU_HIGH = getattr(settings, 'CAMERA_GOVERNOR_CPU_HIGH', 0.85)
+
+# Process CPU below which degraded streams are stepped back up
+GOVERNOR_CPU_LOW = getattr(settings, 'CAMERA_GOVERNOR_CPU_LOW', 0.6)
+
+# Queued encodes per encode worker above which streams are stepped down
+GOVERNOR_QUEUE_HIGH = getattr(settings, 'CAMERA_GOVERNOR_QUEUE_HIGH', 2)
+
+# Caps applied at each step down, mildest first
+GOVERNOR_STEPS = getattr(settings, 'CAMERA_GOVERNOR_STEPS', [
+    {'max_fps': 15},
+    {'max_fps': 10, 'max_quality': 80},
+    {'max_fps': 5, 'max_quality': 70, 'max_width': 1280},
+    {'max_fps': 2, 'max_quality': 60, 'max_width': 640},
+])
+
+# Seconds between two reloads of the cluster priorities from the database
+PRIORITY_RELOAD_SECONDS = 30
+
+DOWN = 'down'
+UP = 'up'
+
+
+def camera_priorities():
+    """
+    Priority of each camera's cluster, keyed by camera ID. Cameras without
+    a cluster have priority 0.
+    """
+    return {
+        camera_id: priority or 0
+        for camera_id, priority in Camera.objects.values_list('id', 'machine__cluster__priority')
+    }
+
+
+class LoadGovernor:
+    """
+    Background thread that trades stream quality for headroom when the
+    process runs short of CPU or the encode pool falls behind.
+
+    Camera hubs are grouped by the priority of their camera's cluster. Under
+    load the lowest-priority group takes one step of steps per interval,
+    through all of them before the next group is touched, so critical lines
+    are degraded last. Once load has dropped the groups are restored in the
+    opposite order, one step at a time.
+    """
+    def __init__(
+        self,
+        interval=GOVERNOR_INTERVAL,
+        cpu_high=GOVERNOR_CPU_HIGH,
+        cpu_low=GOVERNOR_CPU_LOW,
+        queue_high=GOVERNOR_QUEUE_HIGH,
+        steps=GOVERNOR_STEPS,
+        encode_workers=ENCODE_WORKERS,
+    ):
+        self.interval = interval
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.queue_high = queue_high
+        self.steps = steps
+        self.encode_workers = encode_workers
+        self.cpu = 0.0
+        self.queue_depth = 0
+        self.levels = {}  # cluster priority -> step
+        self._priorities = {}  # camera ID -> cluster priority
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="load-governor", daemon=True)
+        self._thread.start()
+        logger.info("Load governor started")
+
+    def _run(self):
+        reload_every = max(1, round(PRIORITY_RELOAD_SECONDS / self.interval))
+        rounds = 0
+        cores = os.cpu_count() or 1
+        previous = self._cpu_seconds(), time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            try:
+                if rounds % reload_every == 0:
+                    close_old_connections()
+                    self._priorities = camera_priorities()
+                rounds += 1
+
+                now = self._cpu_seconds(), time.monotonic()
+                self.cpu = (now[0] - previous[0]) / (now[1] - previous[1]) / cores
+                previous = now
+                self.queue_depth = encode_pool.queue_depth()
+
+                hubs = [hub for hub in running_hubs() if isinstance(hub, CameraHub)]
+                self.adjust(self.cpu, self.queue_depth, {self.priority(hub) for hub in hubs})
+                self.apply(hubs)
+            except Exception as e:
+                logger.error(f"Error in load governor: {e}")
+
+    def _cpu_seconds(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    def priority(self, hub):
+        return self._priorities.get(hub.camera_id, 0)
+
+    def adjust(self, cpu, queue_depth, priorities):
+        """
+        Take one step down for the lowest-priority group of priorities still
+        able to, or one step up for the highest degraded group, depending on
+        load. Return DOWN, UP or None.
+        """
+        if cpu > self.cpu_high or queue_depth > self.queue_high * self.encode_workers:
+            for priority in sorted(priorities):
+                level = self.levels.get(priority, 0)
+                if level < len(self.steps):
+                    self.levels[priority] = level + 1
+                    self._stepped(DOWN, priority, cpu, queue_depth)
+                    return DOWN
+        elif cpu < self.cpu_low and queue_depth < self.encode_workers:
+            for priority in sorted(self.levels, reverse=True):
+                if self.levels[priority]:
+                    self.levels[priority] -= 1
+                    self._stepped(UP, priority, cpu, queue_depth)
+                    return UP
+        return None
+
+    def apply(self, hubs):
+        """
+        Give each hub the caps of its group's current step.
+        """
+        for hub in hubs:
+            level = self.levels.get(self.priority(hub), 0)
+            hub.limits = self.steps[level - 1] if level else None
+            hub.level = level
+
+    def _stepped(self, direction, priority, cpu, queue_depth):
+        counter('governor_steps_total', direction=direction).inc()
+        logger.info(
+            f"Stepped priority {priority} streams {direction} to level {self.levels[priority]} "
+            f"(cpu {cpu:.0%}, {queue_depth} encodes queued)"
+        )
+
+    def stats(self):
+        return {
+            "cpu": round(self.cpu, 3),
+            "queue_depth": self.queue_depth,
+            "levels": dict(self.levels),
+        }
+
+
+# Process-wide governor, started by the ASGI and WSGI entry points
+governor = LoadGovernor()
+
+
+def start():
+    if GOVERNOR_ENABLED:
+        governor.start()
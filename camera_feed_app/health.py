@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from .hub import get_running_hub
+from .models import Camera
+from .rtsp import probe_camera
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Run the background health monitor in this process
+HEALTH_MONITOR_ENABLED = getattr(settings, 'CAMERA_HEALTH_MONITOR', True)
+
+# Seconds between two probes of the same camera
+HEALTH_INTERVAL = getattr(settings, 'CAMERA_HEALTH_INTERVAL', 30)
+
+# Probes in flight at once
+HEALTH_CONCURRENCY = getattr(settings, 'CAMERA_HEALTH_CONCURRENCY', 16)
+
+# Seconds a probe may take before the camera counts as offline
+HEALTH_TIMEOUT = getattr(settings, 'CAMERA_HEALTH_TIMEOUT', 5)
+
+# Also DESCRIBE the stream, which checks credentials and path, not just
+# that the RTSP server answers
+HEALTH_DESCRIBE = getattr(settings, 'CAMERA_HEALTH_DESCRIBE', True)
+
+STATUS_UNKNOWN = 'unknown'
+STATUS_ONLINE = 'online'
+STATUS_OFFLINE = 'offline'
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else None
+
+
+def live_frame_time(camera_id):
+    """
+    Capture time of the newest frame a running hub has of the camera, or
+    None. A camera that is being streamed needs no probe.
+    """
+    times = []
+    for profile in (Camera.MAIN_STREAM, Camera.SUB_STREAM):
+        hub = get_running_hub(camera_id, profile)
+        if hub is not None and hub.latest is not None:
+            times.append(hub.latest.timestamp)
+    return max(times, default=None)
+
+
+class HealthMonitor:
+    """
+    Probes every camera on a schedule from an event loop in a background
+    thread, at most concurrency at a time, and caches the results so status
+    requests never touch a camera.
+    """
+    def __init__(
+        self,
+        interval=HEALTH_INTERVAL,
+        concurrency=HEALTH_CONCURRENCY,
+        timeout=HEALTH_TIMEOUT,
+        describe=HEALTH_DESCRIBE,
+    ):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.describe = describe
+        self.rounds = 0
+        self._results = {}  # camera ID -> status dict
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=asyncio.run, args=(self._run(),), name="camera-health", daemon=True
+            )
+        self._thread.start()
+        logger.info("Camera health monitor started")
+
+    def status(self, camera_id):
+        with self._lock:
+            result = self._results.get(camera_id)
+        if result is None:
+            return {
+                "status": STATUS_UNKNOWN, "last_seen": None, "latency_ms": None, "checked_at": None,
+            }
+        return {
+            "status": result["status"],
+            "last_seen": _datetime(result["last_seen"]),
+            "latency_ms": result["latency_ms"],
+            "checked_at": _datetime(result["checked_at"]),
+        }
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while True:
+            started = time.monotonic()
+            try:
+                cameras = [camera async for camera in Camera.objects.all()]
+                await sync_to_async(close_old_connections)()
+                await asyncio.gather(*(self._check(camera, semaphore) for camera in cameras))
+                known = {camera.id for camera in cameras}
+                with self._lock:
+                    for camera_id in list(self._results):
+                        if camera_id not in known:
+                            del self._results[camera_id]
+                self.rounds += 1
+            except Exception as e:
+                logger.error(f"Error in camera health monitor: {e}")
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - started)))
+
+    async def _check(self, camera, semaphore):
+        frame_time = live_frame_time(camera.id)
+        if frame_time is not None and time.time() - frame_time <= self.timeout:
+            self._record(camera.id, True, frame_time, None)
+            return
+
+        async with semaphore:
+            result = await probe_camera(camera, describe=self.describe, timeout=self.timeout)
+        if not result.online:
+            logger.debug(f"Health probe of camera {camera.id} failed: {result.error}")
+        self._record(
+            camera.id, result.online, time.time() if result.online else None, result.latency_ms
+        )
+
+    def _record(self, camera_id, online, seen_at, latency_ms):
+        with self._lock:
+            previous = self._results.get(camera_id, {})
+            self._results[camera_id] = {
+                "status": STATUS_ONLINE if online else STATUS_OFFLINE,
+                "last_seen": seen_at or previous.get("last_seen"),
+                "latency_ms": latency_ms,
+                "checked_at": time.time(),
+            }
+        if previous and previous["status"] != self._results[camera_id]["status"]:
+            logger.info(f"Camera {camera_id} is now {self._results[camera_id]['status']}")
+
+
+# Process-wide monitor, started by the first status request
+monitor = HealthMonitor()
+
+
+def get_monitor():
+    if HEALTH_MONITOR_ENABLED:
+        monitor.start()
+    return monitor
@@ -0,0 +1,772 @@
+import asyncio
+import cv2
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from . import dvr
+from .encoder import encode_pool
+from .metrics import counter, histogram
+from .models import Camera
+from .motion import ChangeDetector
+from .pool import capture_pool
+from .shm import SharedFrameCapture, ring_exists, ring_name
+from .supervisor import get_supervisor
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# JPEG quality used when a viewer does not ask for one (OpenCV's own default)
+DEFAULT_JPEG_QUALITY = getattr(settings, 'CAMERA_JPEG_QUALITY', 95)
+
+# Read frames that `manage.py run_ingest` publishes to shared memory rather
+# than decoding RTSP in this process. The ingest daemon itself turns this off.
+use_shared_memory = getattr(settings, 'CAMERA_INGEST_MODE', 'local') == 'shared_memory'
+
+# While a scene is static, viewers get a repeat of it this often, in seconds
+STATIC_KEEPALIVE_SECONDS = getattr(settings, 'CAMERA_STATIC_KEEPALIVE_SECONDS', 1)
+
+# Seconds a hub keeps running after its last viewer left, so a viewer who
+# comes back soon finds it warm
+HUB_LINGER_SECONDS = getattr(settings, 'CAMERA_HUB_LINGER_SECONDS', 30)
+
+# Frames per second converted by a hub without viewers; the rest are only
+# drained from the stream
+IDLE_FPS = getattr(settings, 'CAMERA_KEEP_WARM_FPS', 1)
+
+# A viewer that leaves a frame unread this long is assumed to be gone
+SUBSCRIBER_TIMEOUT = getattr(settings, 'CAMERA_SUBSCRIBER_TIMEOUT', 60)
+
+# Set once the reaper runs (see reaper.py). Until then a hub stops as soon
+# as its last viewer leaves, since nothing would stop it later.
+linger = False
+
+# Oldest cached frame, in seconds, a new viewer is shown while the live
+# stream starts
+FIRST_FRAME_MAX_AGE = getattr(settings, 'CAMERA_FIRST_FRAME_MAX_AGE', 10)
+
+# Threads available to async streams for blocking OpenCV work
+STREAM_EXECUTOR_WORKERS = getattr(settings, 'CAMERA_STREAM_EXECUTOR_WORKERS', 8)
+
+# Bounded pool that async views hand blocking probe calls to, so waiting
+# viewers hold no thread at all
+stream_executor = ThreadPoolExecutor(
+    max_workers=STREAM_EXECUTOR_WORKERS, thread_name_prefix="camera-stream"
+)
+
+
+class Frame:
+    """
+    A decoded frame published by a hub, numbered in capture order.
+
+    scene_seq is the number of the last frame that showed a visible change;
+    frames since then look the same and can share its encode.
+    """
+    def __init__(self, seq, image, timestamp, scene_seq=None):
+        self.seq = seq
+        self.image = image
+        self.timestamp = timestamp
+        self.scene_seq = seq if scene_seq is None else scene_seq
+        self._levels = {}  # width -> resized image, shared by all viewers
+        self._levels_lock = threading.Lock()
+
+    def resized(self, width=None):
+        """
+        Return the frame scaled to width, keeping its aspect ratio. Each
+        width is computed once per frame, starting from the smallest level
+        already computed that is still larger than the target.
+        """
+        full_width = self.image.shape[1]
+        if width is None or width >= full_width:
+            return self.image
+        with self._levels_lock:
+            image = self._levels.get(width)
+            if image is None:
+                larger = [level for w, level in self._levels.items() if w > width]
+                source = min(larger, key=lambda level: level.shape[1]) if larger else self.image
+                height = max(1, round(self.image.shape[0] * width / full_width))
+                image = cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+                self._levels[width] = image
+            return image
+
+    @property
+    def changed(self):
+        return self.scene_seq == self.seq
+
+
+# Part headers with the frame's sequence number, the Unix time the server
+# captured it and the Unix time the part was sent
+SEQUENCE_HEADER = 'X-Frame-Sequence'
+CAPTURE_TIME_HEADER = 'X-Capture-Timestamp'
+SEND_TIME_HEADER = 'X-Send-Timestamp'
+
+
+def mjpeg_part(jpeg, seq=None, timestamp=None, sent_at=None):
+    """
+    Wrap a JPEG as one part of a multipart/x-mixed-replace stream. The
+    frame's sequence number, capture time and send time are added as part
+    headers when given, so clients can measure how late frames arrive.
+    """
+    headers = [
+        b'--frame\r\n'
+        b'Content-Type: image/jpeg\r\n'
+        b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n'
+    ]
+    if seq is not None:
+        headers.append(f"{SEQUENCE_HEADER}: {seq}\r\n".encode())
+    if timestamp is not None:
+        headers.append(f"{CAPTURE_TIME_HEADER}: {timestamp:.6f}\r\n".encode())
+    if sent_at is not None:
+        headers.append(f"{SEND_TIME_HEADER}: {sent_at:.6f}\r\n".encode())
+    return b''.join(headers) + b'\r\n' + jpeg + b'\r\n'
+
+
+class EncodedFrame:
+    """
+    A JPEG-encoded frame, shared by every viewer it is sent to.
+    """
+    def __init__(self, seq, timestamp, jpeg):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.jpeg = jpeg
+
+    def part(self):
+        """
+        The multipart part for this frame, stamped with the time it is sent.
+        Built per send; the JPEG itself is encoded once.
+        """
+        return mjpeg_part(self.jpeg, self.seq, self.timestamp, time.time())
+
+
+def encode_frame(frame, quality=DEFAULT_JPEG_QUALITY, width=None):
+    """
+    Encode a frame as JPEG, optionally scaled down to width.
+    """
+    image = frame.resized(width)
+    ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError(f"Unable to encode frame {frame.seq} as JPEG.")
+    return EncodedFrame(frame.seq, frame.timestamp, jpeg.tobytes())
+
+
+class _EncodeSlot:
+    """
+    Encode of the latest frame for one set of encode parameters, as a
+    future that may still be running on the encode pool.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = None
+        self.future = None
+
+
+class Subscriber:
+    """
+    A single viewer attached to a CameraHub.
+
+    Each viewer has a one-frame mailbox: publishing replaces any frame the
+    viewer has not picked up yet, so a slow client skips stale frames and
+    stays close to live without ever blocking the capture thread.
+    """
+    def __init__(self, hub, max_fps=None, quality=DEFAULT_JPEG_QUALITY, width=None):
+        self.hub = hub
+        self.quality = quality
+        self.width = width
+        self.min_interval = 1.0 / max_fps if max_fps else 0
+        self.delivered = 0
+        self.dropped = 0
+        self._frame = None
+        self._next_due = 0
+        self._last_offered = 0
+        self._waiting_since = None
+        self._ready = threading.Condition(threading.Lock())
+        self._loop = None  # Set when an async viewer waits on this mailbox
+        self._event = None
+
+    def interval(self):
+        """
+        Seconds between two frames for this viewer: its max_fps, or the load
+        governor's cap on the hub if that is lower.
+        """
+        limits = self.hub.limits
+        if limits is not None and limits.get('max_fps'):
+            return max(self.min_interval, 1.0 / limits['max_fps'])
+        return self.min_interval
+
+    def wants(self, timestamp):
+        """
+        Whether a frame captured at timestamp would pass this viewer's
+        max_fps, so the hub knows whether to convert it at all.
+        """
+        return not self.interval() or timestamp >= self._next_due
+
+    def put(self, frame):
+        """
+        Offer a frame to the viewer. Returns False if max_fps or static
+        scene throttling skipped it.
+        """
+        if not frame.changed and frame.timestamp - self._last_offered < STATIC_KEEPALIVE_SECONDS:
+            return False  # Nothing new to see; only an occasional keepalive
+        interval = self.interval()
+        if interval:
+            # Frames faster than max_fps are never offered to this viewer
+            if frame.timestamp < self._next_due:
+                return False
+            self._next_due = max(
+                self._next_due + interval,
+                frame.timestamp + interval / 2,
+            )
+        self._last_offered = frame.timestamp
+        with self._ready:
+            if self._frame is not None:
+                self.dropped += 1  # Viewer never picked this one up
+                self.hub.frames_dropped.inc()
+            else:
+                self._waiting_since = time.monotonic()
+            self._frame = frame
+            self._ready.notify()
+            loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                pass  # Event loop already closed; the viewer is gone
+        return True
+
+    def get(self, timeout=None):
+        """
+        Wait for the newest frame. Raises queue.Empty on timeout.
+        """
+        with self._ready:
+            if self._frame is None and not self._ready.wait_for(
+                lambda: self._frame is not None, timeout
+            ):
+                raise queue.Empty
+            frame, self._frame = self._frame, None
+            self.delivered += 1
+            return frame
+
+    def poll(self):
+        """
+        Take the newest frame if one is waiting, else return None.
+        """
+        with self._ready:
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                self.delivered += 1
+            return frame
+
+    async def get_async(self, timeout=None):
+        """
+        Wait for the newest frame without blocking the event loop.
+        Raises asyncio.TimeoutError on timeout.
+        """
+        with self._ready:
+            if self._loop is None:
+                self._loop = asyncio.get_running_loop()
+                self._event = asyncio.Event()
+        while True:
+            with self._ready:
+                self._event.clear()
+                if self._frame is not None:
+                    frame, self._frame = self._frame, None
+                    self.delivered += 1
+                    return frame
+            await asyncio.wait_for(self._event.wait(), timeout)
+
+    def encode(self, frame):
+        """
+        Encode a frame in this viewer's variant, shared with every other
+        viewer asking for the same width and quality.
+        """
+        return self.hub.encode(frame, *self.hub.limited(frame, self.quality, self.width))
+
+    def request_encode(self, frame):
+        """
+        Like encode(), but return a concurrent.futures.Future instead of
+        waiting, so async viewers can await it.
+        """
+        return self.hub.request_encode(frame, *self.hub.limited(frame, self.quality, self.width))
+
+    def is_abandoned(self, timeout=SUBSCRIBER_TIMEOUT):
+        """
+        Whether a frame has been waiting unread for longer than timeout.
+        """
+        with self._ready:
+            return self._frame is not None and time.monotonic() - self._waiting_since > timeout
+
+    def close(self):
+        unsubscribe(self)
+        if self.dropped:
+            logger.info(
+                f"Viewer of {self.hub} skipped {self.dropped} "
+                f"of {self.delivered + self.dropped} frames"
+            )
+
+
+def ingest_available(camera_id, profile):
+    """
+    Whether the ingest daemon is publishing this camera stream.
+    """
+    return use_shared_memory and ring_exists(ring_name(camera_id, profile))
+
+
+def open_stream_capture(camera, profile):
+    """
+    Open a capture of a camera stream: the ingest daemon's shared memory
+    ring when it publishes the stream, otherwise RTSP through the pool.
+    """
+    if ingest_available(camera.id, profile):
+        return SharedFrameCapture(ring_name(camera.id, profile), camera.read_timeout_ms)
+    return capture_pool.acquire(camera.stream_url(profile), **camera.capture_options())
+
+
+def release_stream_capture(camera, profile, cap):
+    if isinstance(cap, SharedFrameCapture):
+        cap.release()
+    else:
+        capture_pool.release(camera.stream_url(profile), cap)
+
+
+class FrameHub:
+    """
+    Owns one producer thread and fans the frames it publishes out to every
+    subscriber. Subclasses implement _run().
+
+    labels identify the hub's stream in metrics. Every stage records into
+    histograms and counters created once here, so the hot path never
+    builds a label set.
+    """
+    def __init__(self, key, labels=None):
+        self.key = key
+        self.labels = labels or {}
+        self.resize_seconds = histogram('stream_resize_seconds', **self.labels)
+        self.encode_seconds = histogram('stream_encode_seconds', **self.labels)
+        self.write_seconds = histogram('stream_write_seconds', **self.labels)
+        self.bytes_sent = counter('stream_bytes_sent_total', **self.labels)
+        self.frames_dropped = counter('stream_frames_dropped_total', **self.labels)
+        self.subscribers = set()
+        self.latest = None
+        self.keep_warm = False  # Set by the reaper for keep-warm cameras
+        self.level = 0  # Load governor step; 0 is full quality
+        self.limits = None  # Caps on max_fps, max_width and max_quality for that step
+        self.idle_since = None
+        self._lock = threading.Lock()
+        self._encode_slots = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="hub-" + "-".join(map(str, self.key)), daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Hub started for {self}")
+
+    def stop(self):
+        self._stop.set()
+        logger.info(f"Hub stopping for {self}")
+
+    def add_subscriber(self, **options):
+        subscriber = Subscriber(self, **options)
+        with self._lock:
+            self.subscribers.add(subscriber)
+        if not self.is_running:
+            self.start()
+        return subscriber
+
+    def abandoned_subscribers(self, timeout=SUBSCRIBER_TIMEOUT):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        return [subscriber for subscriber in subscribers if subscriber.is_abandoned(timeout)]
+
+    def dropped_frames(self):
+        """
+        Frames skipped per viewer because the viewer was behind live.
+        """
+        with self._lock:
+            return [subscriber.dropped for subscriber in self.subscribers]
+
+    def remove_subscriber(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+            return len(self.subscribers)
+
+    def encode(self, frame, quality=DEFAULT_JPEG_QUALITY, width=None):
+        """
+        Return the frame encoded with the given parameters. The first viewer
+        to ask for a frame encodes it; everyone else reuses the same bytes.
+        """
+        return self.request_encode(frame, quality, width).result()
+
+    def limited(self, frame, quality, width):
+        """
+        The quality and width to encode for a viewer asking for quality and
+        width, within the load governor's caps.
+        """
+        limits = self.limits
+        if limits is None:
+            return quality, width
+        if limits.get('max_quality'):
+            quality = min(quality, limits['max_quality'])
+        max_width = limits.get('max_width')
+        if max_width and (width or frame.image.shape[1]) > max_width:
+            width = max_width
+        return quality, width
+
+    def request_encode(self, frame, quality=DEFAULT_JPEG_QUALITY, width=None):
+        """
+        Return a future for the frame encoded with the given parameters,
+        queueing the encode on the shared encode pool if nobody has yet.
+        Frames of an unchanged scene reuse the encode of an earlier one.
+        """
+        key = (quality, width)
+        with self._lock:
+            slot = self._encode_slots.get(key)
+            if slot is None:
+                slot = self._encode_slots[key] = _EncodeSlot()
+        with slot.lock:
+            if slot.seq is not None and frame.scene_seq <= slot.seq <= frame.seq:
+                return slot.future
+            future = encode_pool.submit(self.key, self._encode, frame, quality, width)
+            # A viewer lagging behind must not evict a newer frame
+            if slot.seq is None or slot.seq < frame.seq:
+                slot.seq, slot.future = frame.seq, future
+            return future
+
+    def _encode(self, frame, quality, width):
+        started = time.monotonic()
+        frame.resized(width)  # Kept on the frame, so encode_frame reuses it
+        resized = time.monotonic()
+        encoded = encode_frame(frame, quality, width)
+        self.resize_seconds.observe(resized - started)
+        self.encode_seconds.observe(time.monotonic() - resized)
+        return encoded
+
+    def publish(self, frame):
+        self.latest = frame
+        with self._lock:
+            subscribers = list(self.subscribers)
+        variants = {
+            (subscriber.quality, subscriber.width)
+            for subscriber in subscribers
+            if subscriber.put(frame)
+        }
+        # Start encoding for the viewers that will want this frame while the
+        # producer moves on to the next one
+        for quality, width in variants:
+            self.request_encode(frame, quality, width)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class CameraHub(FrameHub):
+    """
+    Owns the single capture thread for one stream of a camera.
+    """
+    def __init__(self, camera, profile):
+        super().__init__((camera.id, profile), {'camera': camera.id, 'profile': profile})
+        self.camera = camera
+        self.camera_id = camera.id
+        self.profile = profile
+        self.decode_fps = 0.0  # Moving average
+        self.decodes = True  # False while frames come from the ingest daemon
+        self.read_seconds = histogram('camera_read_seconds', **self.labels)
+        self.decode_seconds = histogram('camera_decode_seconds', **self.labels)
+        self.frames_grabbed = counter('camera_frames_grabbed_total', **self.labels)
+        self.frames_decoded = counter('camera_frames_decoded_total', **self.labels)
+
+    def __str__(self):
+        return f"camera {self.camera_id} ({self.profile} stream)"
+
+    def _wants_frame(self, timestamp, replay, next_idle):
+        """
+        Whether a frame captured at timestamp will be delivered to anyone:
+        a viewer whose max_fps lets it through, the replay buffer, or the
+        occasional frame of a hub without viewers.
+        """
+        with self._lock:
+            subscribers = list(self.subscribers)
+        if not subscribers:
+            return time.monotonic() >= next_idle
+        if replay is not None and replay.wants(timestamp):
+            return True
+        return any(subscriber.wants(timestamp) for subscriber in subscribers)
+
+    def _run(self):
+        supervisor = get_supervisor(self.camera_id)
+        detector = ChangeDetector()
+        replay = dvr.get_buffer(self.camera_id) if dvr.recording else None
+        cap = None
+        seq = 0
+        scene_seq = 0
+        idle_interval = 1.0 / IDLE_FPS
+        next_idle = 0
+        last_decoded = None
+        try:
+            while not self._stop.is_set():
+                if cap is None:
+                    cap = open_stream_capture(self.camera, self.profile)
+                    self.decodes = not isinstance(cap, SharedFrameCapture)
+
+                if not cap.isOpened():
+                    message = f"Camera {self.camera_id} feed disconnected. Attempting to reconnect..."
+                    ret = False
+                else:
+                    # Frames nobody will be sent are only drained from the
+                    # stream; pixels are converted for the ones delivered
+                    started = time.monotonic()
+                    ret, image = cap.grab(), None
+                    grabbed = time.monotonic()
+                    timestamp = time.time()
+                    if ret:
+                        self.read_seconds.observe(grabbed - started)
+                        self.frames_grabbed.inc()
+                        if self._wants_frame(timestamp, replay, next_idle):
+                            ret, image = cap.retrieve()
+                            decoded = time.monotonic()
+                            self.decode_seconds.observe(decoded - grabbed)
+                            self.frames_decoded.inc()
+                            if last_decoded is not None and decoded > last_decoded:
+                                self.decode_fps += 0.1 * (1 / (decoded - last_decoded) - self.decode_fps)
+                            last_decoded = decoded
+                    message = f"Failed to read frame from camera {self.camera_id}. Reconnecting..."
+
+                if not ret:
+                    cap.release()
+                    cap = None
+                    delay = supervisor.record_failure()
+                    supervisor.log.log(logging.WARNING, message)
+                    # Back off before reopening; stop() cuts the wait short
+                    self._stop.wait(delay)
+                    continue
+
+                supervisor.record_success()
+                if image is None:
+                    continue
+                if not self.subscribers:
+                    next_idle = time.monotonic() + idle_interval
+                seq += 1
+                if detector.update(image):
+                    scene_seq = seq
+                frame = Frame(seq, image, timestamp, scene_seq)
+                self.publish(frame)
+                if replay is not None:
+                    replay.offer(frame, self.request_encode)
+        except Exception as e:
+            logger.error(f"Error in capture hub for camera {self.camera_id}: {e}")
+        finally:
+            if cap is not None:
+                # Keep the session warm in case a viewer comes back shortly
+                release_stream_capture(self.camera, self.profile, cap)
+            logger.info(f"Capture hub stopped for camera {self.camera_id}")
+
+
+# Process-wide registry of running hubs, keyed by (camera ID, stream profile)
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+# How viewers found their hub: cold_starts created one, warm_hits found a
+# running hub nobody was watching (lingering or kept warm), joins found one
+# with viewers. reaped counts hubs stopped by the reaper.
+_lifecycle = {"cold_starts": 0, "warm_hits": 0, "joins": 0, "reaped": 0, "abandoned_viewers": 0}
+
+# Most recent snapshots taken outside a hub, keyed by (camera ID, quality, width)
+_snapshots = {}
+
+
+def store_snapshot(camera_id, encoded, quality=DEFAULT_JPEG_QUALITY, width=None):
+    _snapshots[(camera_id, quality, width)] = encoded
+
+
+def recent_snapshot(camera_id, max_age, quality=DEFAULT_JPEG_QUALITY, width=None):
+    """
+    Return the camera's last stored snapshot in the given variant if it is
+    at most max_age seconds old, else None.
+    """
+    encoded = _snapshots.get((camera_id, quality, width))
+    if encoded is not None and time.time() - encoded.timestamp <= max_age:
+        return encoded
+    return None
+
+
+def cached_frame(camera_id, profile, quality=DEFAULT_JPEG_QUALITY, width=None, max_age=FIRST_FRAME_MAX_AGE):
+    """
+    Return the newest already captured frame of the camera that is at most
+    max_age seconds old, as an EncodedFrame, or None. Looks at the running
+    hub, then stored snapshots, then the replay buffer, whose frames keep
+    the recording's size and quality. Never opens the camera.
+    """
+    hub = get_running_hub(camera_id, profile) or get_running_hub(camera_id, Camera.MAIN_STREAM)
+    frame = hub.latest if hub is not None else None
+    if frame is not None and time.time() - frame.timestamp <= max_age:
+        return hub.encode(frame, quality, width)
+
+    encoded = recent_snapshot(camera_id, max_age, quality, width)
+    if encoded is not None:
+        return encoded
+
+    replay = dvr.find_buffer(camera_id)
+    latest = replay.latest() if replay is not None else None
+    if latest is not None and time.time() - latest[0] <= max_age:
+        return EncodedFrame(0, latest[0], latest[1])
+    return None
+
+
+def get_running_hub(camera_id, profile):
+    """
+    Return the hub for a camera stream if it is currently decoding, else None.
+    """
+    with _hubs_lock:
+        hub = _hubs.get((camera_id, profile))
+    if hub is not None and hub.is_running:
+        return hub
+    return None
+
+
+def attach(key, factory, **options):
+    """
+    Attach a new viewer to the hub registered under key, creating it with
+    factory() and starting it if needed.
+    """
+    with _hubs_lock:
+        hub = _hubs.get(key)
+        if hub is None:
+            hub = _hubs[key] = factory()
+            _lifecycle["cold_starts"] += 1
+        elif not hub.is_running:
+            _lifecycle["cold_starts"] += 1
+        elif hub.subscribers:
+            _lifecycle["joins"] += 1
+        else:
+            _lifecycle["warm_hits"] += 1
+        hub.idle_since = None
+        return hub.add_subscriber(**options)
+
+
+def subscribe(camera, profile, **options):
+    """
+    Attach a new viewer to the hub of a camera stream, starting the hub if
+    needed. options (max_fps, quality, width) describe the variant the
+    viewer wants.
+    """
+    return attach((camera.id, profile), lambda: CameraHub(camera, profile), **options)
+
+
+def unsubscribe(subscriber):
+    """
+    Detach a viewer. Once its last viewer has left, the hub lingers for the
+    reaper to stop later if the reaper runs, else it is stopped right away.
+    """
+    hub = subscriber.hub
+    with _hubs_lock:
+        if hub.remove_subscriber(subscriber) == 0:
+            if linger or hub.keep_warm:
+                hub.idle_since = time.monotonic()
+            else:
+                _remove_hub(hub)
+
+
+def _remove_hub(hub):
+    # Callers hold _hubs_lock
+    hub.stop()
+    if _hubs.get(hub.key) is hub:
+        del _hubs[hub.key]
+
+
+def keep_warm(camera, profile):
+    """
+    Make sure the camera stream is being decoded even without viewers and
+    keep it running until the reaper is told otherwise. A hub left over
+    from an older version of the camera's settings is replaced.
+    """
+    key = (camera.id, profile)
+    with _hubs_lock:
+        hub = _hubs.get(key)
+        if (
+            hub is not None and not hub.subscribers
+            and hub.camera.stream_url(profile) != camera.stream_url(profile)
+        ):
+            _remove_hub(hub)
+            hub = None
+        if hub is None:
+            hub = _hubs[key] = CameraHub(camera, profile)
+            hub.idle_since = time.monotonic()
+        hub.keep_warm = True
+        if not hub.is_running:
+            hub.start()
+    return hub
+
+
+def reap(warm_keys=(), linger_seconds=HUB_LINGER_SECONDS, subscriber_timeout=SUBSCRIBER_TIMEOUT):
+    """
+    Detach abandoned viewers and stop hubs that have had no viewers for
+    linger_seconds, except those whose key is in warm_keys.
+    """
+    with _hubs_lock:
+        hubs = list(_hubs.values())
+    for hub in hubs:
+        for subscriber in hub.abandoned_subscribers(subscriber_timeout):
+            logger.info(f"Detaching a viewer of {hub} that stopped reading")
+            with _hubs_lock:
+                _lifecycle["abandoned_viewers"] += 1
+            subscriber.close()
+
+    now = time.monotonic()
+    with _hubs_lock:
+        for hub in list(_hubs.values()):
+            hub.keep_warm = hub.key in warm_keys
+            if hub.subscribers or hub.keep_warm:
+                continue
+            if hub.idle_since is None:
+                hub.idle_since = now
+            if now - hub.idle_since >= linger_seconds or not hub.is_running:
+                _remove_hub(hub)
+                _lifecycle["reaped"] += 1
+
+
+def release_idle_hub():
+    """
+    Stop the hub that has been without viewers longest, unless it is kept
+    warm, to free its decoder. Return whether one was stopped.
+    """
+    with _hubs_lock:
+        idle = [
+            hub for hub in _hubs.values()
+            if isinstance(hub, CameraHub) and hub.decodes
+            and not hub.subscribers and not hub.keep_warm and hub.idle_since is not None
+        ]
+        if not idle:
+            return False
+        hub = min(idle, key=lambda hub: hub.idle_since)
+        _remove_hub(hub)
+        _lifecycle["reaped"] += 1
+    logger.info(f"Stopped idle {hub} to make room for a new stream")
+    return True
+
+
+def running_hubs():
+    with _hubs_lock:
+        return list(_hubs.values())
+
+
+def lifecycle_stats():
+    """
+    Counters of how viewers found their hubs, and hubs currently running.
+    """
+    with _hubs_lock:
+        stats = dict(_lifecycle)
+        stats["running_hubs"] = len(_hubs)
+        stats["idle_hubs"] = sum(1 for hub in _hubs.values() if not hub.subscribers)
+    # Share of viewers who would have had to open the camera but found it warm
+    opening = stats["cold_starts"] + stats["warm_hits"]
+    stats["warm_hit_ratio"] = round(stats["warm_hits"] / opening, 3) if opening else None
+    return stats
@@ -0,0 +1,108 @@
+import logging
+import queue
+import signal
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+from . import dvr, hub
+from .models import Camera
+from .shm import SharedFrameWriter, ring_name
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Streams the ingest daemon decodes for every camera
+INGEST_PROFILES = getattr(settings, 'CAMERA_INGEST_PROFILES', [Camera.MAIN_STREAM])
+
+# Seconds between two checks of the camera table for added or changed cameras
+RELOAD_SECONDS = getattr(settings, 'CAMERA_INGEST_RELOAD_SECONDS', 30)
+
+
+class Ingestor:
+    """
+    Decodes one camera stream through a local capture hub and writes every
+    frame into the stream's shared memory ring.
+    """
+    def __init__(self, camera, profile):
+        self.camera = camera
+        self.profile = profile
+        self.camera_url = camera.stream_url(profile)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"ingest-{camera.id}-{profile}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        name = ring_name(self.camera.id, self.profile)
+        subscriber = hub.subscribe(self.camera, self.profile)
+        writer = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    frame = subscriber.get(timeout=1)
+                except queue.Empty:
+                    continue
+
+                if writer is None or writer.shape != frame.image.shape:
+                    if writer is not None:
+                        writer.close()
+                    writer = SharedFrameWriter(name, frame.image.shape)
+                    logger.info(f"Publishing camera {self.camera.id} ({self.profile}) to {name}")
+                writer.write(frame.image, frame.timestamp)
+        except Exception as e:
+            logger.error(f"Error ingesting camera {self.camera.id}: {e}")
+        finally:
+            subscriber.close()
+            if writer is not None:
+                writer.close()
+
+
+def run_shard(index, count, profiles=INGEST_PROFILES):
+    """
+    Entry point of one ingest process. Decodes every camera whose ID falls
+    in this shard and keeps the set in sync with the camera table.
+    """
+    # This process is the one decoding; it must not read its own rings
+    hub.use_shared_memory = False
+    # Web workers record what they read from the rings
+    dvr.recording = False
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    ingestors = {}
+    while not stop.is_set():
+        close_old_connections()
+        wanted = {}
+        for camera in Camera.objects.all():
+            if camera.id % count == index:
+                for profile in profiles:
+                    wanted[(camera.id, profile)] = camera
+
+        for key, ingestor in list(ingestors.items()):
+            camera = wanted.get(key)
+            if camera is None or camera.stream_url(key[1]) != ingestor.camera_url:
+                ingestor.stop()
+                del ingestors[key]
+        for key, camera in wanted.items():
+            if key not in ingestors:
+                ingestors[key] = Ingestor(camera, key[1])
+                ingestors[key].start()
+
+        stop.wait(RELOAD_SECONDS)
+
+    for ingestor in ingestors.values():
+        ingestor.stop()
+    for ingestor in ingestors.values():
+        ingestor.join(timeout=5)
+    logger.info(f"Ingest shard {index} stopped")
@@ -0,0 +1,65 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from camera_feed_app.encoder import EncodePool
+from camera_feed_app.hub import DEFAULT_JPEG_QUALITY, Frame, encode_frame
+from camera_feed_app.sources import synthetic_image
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many frames per second the JPEG encode pool sustains "
+        "for several cameras as encoder threads are added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cameras', type=int, default=8, help="Simulated cameras.")
+        parser.add_argument('--frames', type=int, default=50, help="Frames encoded per camera and run.")
+        parser.add_argument('--width', type=int, default=1920)
+        parser.add_argument('--height', type=int, default=1080)
+        parser.add_argument('--quality', type=int, default=DEFAULT_JPEG_QUALITY)
+        parser.add_argument(
+            '--workers', type=int, nargs='+',
+            help="Pool sizes to try (default: 1, 2, 4, ... up to the core count)."
+        )
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count()
+        workers = options['workers']
+        if not workers:
+            workers = [1]
+            while workers[-1] * 2 < cores:
+                workers.append(workers[-1] * 2)
+            if workers[-1] != cores:
+                workers.append(cores)
+
+        images = [
+            synthetic_image(options['width'], options['height'], seed)
+            for seed in range(options['cameras'])
+        ]
+        self.stdout.write(
+            f"{options['cameras']} cameras, {options['width']}x{options['height']}, "
+            f"quality {options['quality']}, {cores} cores"
+        )
+        self.stdout.write(f"{'workers':>8} {'frames/s':>10} {'speedup':>8} {'max queue':>10}")
+
+        baseline = None
+        for count in workers:
+            pool = EncodePool(count)
+            max_depth = 0
+            start = time.perf_counter()
+            futures = []
+            for seq in range(options['frames']):
+                for camera, image in enumerate(images):
+                    futures.append(pool.submit(
+                        camera, encode_frame, Frame(seq, image, time.time()), options['quality']
+                    ))
+                max_depth = max(max_depth, pool.queue_depth())
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - start
+            pool.shutdown()
+
+            rate = len(futures) / elapsed
+            baseline = baseline or rate
+            self.stdout.write(f"{count:>8} {rate:>10.1f} {rate / baseline:>7.2f}x {max_depth:>10}")
@@ -0,0 +1,199 @@
+import os
+import resource
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from camera_feed_app.hub import DEFAULT_JPEG_QUALITY, running_hubs, subscribe
+from camera_feed_app.models import Camera
+from camera_feed_app.views import generate_mjpeg
+
+# Simulated cameras get IDs from here up, clear of real cameras whose
+# streams an ingest daemon on this host may be publishing
+CAMERA_ID_BASE = 900000
+
+
+class TimedSubscriber:
+    """
+    Wraps a subscriber to remember the capture time of the frame the MJPEG
+    generator is about to send.
+    """
+    def __init__(self, subscriber):
+        self.subscriber = subscriber
+        self.hub = subscriber.hub
+        self.frame_time = None
+
+    def get(self, timeout=None):
+        frame = self.subscriber.get(timeout)
+        self.frame_time = frame.timestamp
+        return frame
+
+    def __getattr__(self, name):
+        return getattr(self.subscriber, name)
+
+
+class Client(threading.Thread):
+    """
+    Pulls MJPEG parts for one viewer as fast as the server produces them.
+    Only parts received between start_at and stop_at are counted.
+    """
+    def __init__(self, number, camera, start_at, stop_at, **options):
+        super().__init__(name=f"bench-client-{number}", daemon=True)
+        self.number = number
+        self.camera = camera
+        self.start_at = start_at
+        self.stop_at = stop_at
+        self.options = options
+        self.frames = 0
+        self.bytes = 0
+        self.latencies = []
+        self.error = None
+
+    def run(self):
+        profile = Camera.profile_for_width(self.options.get('width'))
+        viewer = None
+
+        def attach_viewer():
+            nonlocal viewer
+            viewer = TimedSubscriber(subscribe(self.camera, profile, **self.options))
+            return viewer
+
+        parts = generate_mjpeg(attach_viewer)
+        try:
+            for part in parts:
+                now = time.monotonic()
+                if now >= self.stop_at:
+                    break
+                if now >= self.start_at:
+                    self.frames += 1
+                    self.bytes += len(part)
+                    self.latencies.append(time.time() - viewer.frame_time)
+        except Exception as e:
+            self.error = e
+        finally:
+            parts.close()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def rss_bytes():
+    """
+    Current resident set size, or the peak where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream simulated cameras to concurrent in-process MJPEG clients and "
+        "report sustained fps per client, frame latency, CPU and memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cameras', type=int, default=4, help="Simulated cameras.")
+        parser.add_argument('--clients', type=int, default=8, help="MJPEG clients, spread over the cameras.")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds measured.")
+        parser.add_argument('--warmup', type=float, default=2, help="Seconds streamed before measuring.")
+        parser.add_argument(
+            '--source', default='synthetic://1920x1080?fps=25',
+            help="Source URL of every camera: synthetic://WIDTHxHEIGHT?fps=N or file:///path/to/video."
+        )
+        parser.add_argument('--width', type=int, help="Width clients ask for.")
+        parser.add_argument('--max-fps', type=float, help="Frame rate clients ask for.")
+        parser.add_argument('--quality', type=int, default=DEFAULT_JPEG_QUALITY)
+        parser.add_argument(
+            '--min-fps', type=float,
+            help="Fail if any client sustained fewer frames per second than this."
+        )
+
+    def handle(self, *args, **options):
+        cameras = [
+            Camera(
+                id=CAMERA_ID_BASE + number, name=f"Simulated camera {number}",
+                source_url=options['source'],
+            )
+            for number in range(options['cameras'])
+        ]
+        stream_options = {
+            'width': options['width'], 'max_fps': options['max_fps'], 'quality': options['quality'],
+        }
+
+        start_at = time.monotonic() + options['warmup']
+        stop_at = start_at + options['duration']
+        clients = [
+            Client(number, cameras[number % len(cameras)], start_at, stop_at, **stream_options)
+            for number in range(options['clients'])
+        ]
+        self.stdout.write(
+            f"{len(cameras)} cameras from {options['source']}, {len(clients)} clients, "
+            f"{options['duration']:g}s after {options['warmup']:g}s warmup, {os.cpu_count()} cores"
+        )
+        rss_before = rss_bytes()
+        for client in clients:
+            client.start()
+
+        time.sleep(max(0, start_at - time.monotonic()))
+        cpu_start = resource.getrusage(resource.RUSAGE_SELF)
+        time.sleep(max(0, stop_at - time.monotonic()))
+        cpu_end = resource.getrusage(resource.RUSAGE_SELF)
+        rss_after = rss_bytes()
+        hubs = running_hubs()
+        for client in clients:
+            client.join(5)
+        # Let the capture threads wind down before the interpreter does
+        deadline = time.monotonic() + 5
+        while any(hub.is_running for hub in hubs) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        for client in clients:
+            if client.error is not None:
+                raise CommandError(f"Client {client.number} failed: {client.error}")
+
+        duration = options['duration']
+        rates = [client.frames / duration for client in clients]
+        latencies = sorted(latency for client in clients for latency in client.latencies)
+        cpu = (
+            cpu_end.ru_utime + cpu_end.ru_stime - cpu_start.ru_utime - cpu_start.ru_stime
+        ) / duration
+
+        if options['verbosity'] > 1:
+            self.stdout.write(f"{'client':>7} {'camera':>7} {'fps':>7} {'kB/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+            for client, rate in zip(clients, rates):
+                own = sorted(client.latencies)
+                p50, p99 = percentile(own, 0.5), percentile(own, 0.99)
+                self.stdout.write(
+                    f"{client.number:>7} {client.camera.id - CAMERA_ID_BASE:>7} {rate:>7.1f} "
+                    f"{client.bytes / duration / 1024:>9.0f} "
+                    f"{p50 * 1000 if p50 is not None else float('nan'):>8.1f} "
+                    f"{p99 * 1000 if p99 is not None else float('nan'):>8.1f}"
+                )
+
+        p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+        self.stdout.write(
+            f"fps per client: min {min(rates):.1f}, mean {sum(rates) / len(rates):.1f}, max {max(rates):.1f}"
+        )
+        if latencies:
+            self.stdout.write(
+                f"frame latency: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms "
+                f"({len(latencies)} frames)"
+            )
+        self.stdout.write(
+            f"cpu: {cpu * 100:.0f}% of a core, {cpu * 100 / len(cameras):.1f}% per camera, "
+            f"{cpu * 100 / len(clients):.1f}% per client"
+        )
+        self.stdout.write(
+            f"memory: {rss_after / 2 ** 20:.0f} MB resident, "
+            f"{(rss_after - rss_before) / 2 ** 20:+.0f} MB while streaming"
+        )
+
+        if options['min_fps'] is not None and min(rates) < options['min_fps']:
+            raise CommandError(
+                f"Slowest client sustained {min(rates):.1f} fps, below {options['min_fps']:g}."
+            )
@@ -0,0 +1,129 @@
+import time
+import urllib.request
+from django.core.management.base import BaseCommand, CommandError
+from camera_feed_app.hub import CAPTURE_TIME_HEADER, SEND_TIME_HEADER, SEQUENCE_HEADER
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def read_parts(response):
+    """
+    Yield (headers, received at) for each part of a multipart MJPEG response,
+    received at being the Unix time its last byte arrived.
+    """
+    while True:
+        line = response.readline()
+        if not line:
+            return
+        if not line.startswith(b'--'):
+            continue  # Blank lines between parts
+
+        headers = {}
+        while True:
+            line = response.readline()
+            if not line:
+                return
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if len(response.read(length)) < length:
+            return
+        yield headers, time.time()
+
+
+class Command(BaseCommand):
+    help = (
+        "Read an MJPEG stream like a viewer would and report how late frames "
+        "arrive, from the capture and send timestamps in each part."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="Stream URL, e.g. http://host:8000/api/camera/1/stream/?max_fps=10")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to read the stream for.")
+        parser.add_argument(
+            '--skip', type=int, default=1,
+            help="Parts ignored at the start; the first one may be a cached frame."
+        )
+        parser.add_argument(
+            '--header', action='append', default=[],
+            help="Request header as 'Name: value', e.g. for authentication. May be repeated."
+        )
+        parser.add_argument(
+            '--slo-ms', type=float,
+            help="Fail if the p99 end-to-end latency is above this many milliseconds."
+        )
+
+    def handle(self, *args, **options):
+        request = urllib.request.Request(options['url'])
+        for header in options['header']:
+            name, _, value = header.partition(':')
+            request.add_header(name.strip(), value.strip())
+
+        end_to_end, server, network = [], [], []
+        frames = skipped = missed = 0
+        last_seq = None
+        try:
+            response = urllib.request.urlopen(request, timeout=10)
+        except OSError as e:
+            raise CommandError(f"Unable to open {options['url']}: {e}")
+
+        started = time.monotonic()
+        with response:
+            for headers, received_at in read_parts(response):
+                if skipped < options['skip']:
+                    skipped += 1
+                    continue
+                frames += 1
+                captured_at = headers.get(CAPTURE_TIME_HEADER.lower())
+                sent_at = headers.get(SEND_TIME_HEADER.lower())
+                seq = headers.get(SEQUENCE_HEADER.lower())
+                if captured_at is not None:
+                    end_to_end.append(received_at - float(captured_at))
+                if captured_at is not None and sent_at is not None:
+                    server.append(float(sent_at) - float(captured_at))
+                if sent_at is not None:
+                    network.append(received_at - float(sent_at))
+                if seq is not None:
+                    # Frames the server had that this viewer never got
+                    if last_seq is not None and int(seq) > last_seq + 1:
+                        missed += int(seq) - last_seq - 1
+                    last_seq = int(seq)
+                if time.monotonic() - started >= options['duration']:
+                    break
+        elapsed = time.monotonic() - started
+
+        if not frames:
+            raise CommandError("No frames received.")
+        if not end_to_end:
+            raise CommandError(f"The stream has no {CAPTURE_TIME_HEADER} headers.")
+
+        self.stdout.write(
+            f"{frames} frames in {elapsed:.1f}s ({frames / elapsed:.1f} fps), "
+            f"{missed} captured frames not sent"
+        )
+        self.stdout.write(f"{'latency':>12} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name, values in (('end-to-end', end_to_end), ('server', server), ('network', network)):
+            if not values:
+                continue
+            values.sort()
+            self.stdout.write(
+                f"{name:>12} " + " ".join(
+                    f"{percentile(values, q) * 1000:>8.1f}" for q in (0.5, 0.9, 0.99, 1)
+                )
+            )
+        self.stdout.write(
+            "End-to-end and network latency compare this host's clock with the "
+            "server's; keep both synchronised (NTP) when they are different machines."
+        )
+
+        p99 = percentile(sorted(end_to_end), 0.99) * 1000
+        if options['slo_ms'] is not None and p99 > options['slo_ms']:
+            raise CommandError(f"p99 end-to-end latency {p99:.1f} ms is above {options['slo_ms']:g} ms.")
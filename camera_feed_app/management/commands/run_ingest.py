@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+import signal
+from django.core.management.base import BaseCommand
+from django.db import connections
+from camera_feed_app.ingest import INGEST_PROFILES, run_shard
+from camera_feed_app.models import Camera
+
+
+class Command(BaseCommand):
+    help = (
+        "Decode every camera in a pool of processes, sharded by camera ID, and "
+        "publish the latest frames to shared memory for the web workers. "
+        "Run the web workers with CAMERA_INGEST_MODE=shared_memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help="Number of decoder processes (default: one per core)."
+        )
+        parser.add_argument(
+            '--profiles', nargs='+', default=INGEST_PROFILES,
+            choices=[Camera.MAIN_STREAM, Camera.SUB_STREAM],
+            help="Camera streams to decode."
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options['processes'])
+
+        # Children open their own database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=run_shard, args=(index, count, options['profiles']), name=f"ingest-{index}"
+            )
+            for index in range(count)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Ingesting {', '.join(options['profiles'])} streams in {count} processes")
+
+        def shutdown(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        for process in processes:
+            process.join()
+        self.stdout.write("Ingest stopped")
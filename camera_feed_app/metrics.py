@@ -0,0 +1,160 @@
+import bisect
+import threading
+
+# Upper bounds, in seconds, of the buckets latencies are counted in
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, Prometheus style, so any
+    number of them costs the same memory.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile as the upper bound of the bucket it falls
+        in; None without observations.
+        """
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def cumulative(self):
+        """
+        Return [(upper bound, observations at or below it)], +Inf last.
+        """
+        with self._lock:
+            counts = list(self.counts)
+        result = []
+        total = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            total += bucket_count
+            result.append((bound, total))
+        return result
+
+
+class Counter:
+    """
+    A value that only goes up.
+    """
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+# Process-wide histograms and counters, keyed by (name, sorted label items)
+_histograms = {}
+_counters = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _registry_lock:
+        found = _histograms.get(key)
+        if found is None:
+            found = _histograms[key] = Histogram()
+        return found
+
+
+def counter(name, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _registry_lock:
+        found = _counters.get(key)
+        if found is None:
+            found = _counters[key] = Counter()
+        return found
+
+
+def observe(name, value, **labels):
+    histogram(name, **labels).observe(value)
+
+
+def histograms():
+    """
+    Return [(name, labels, histogram)] for every histogram observed so far.
+    """
+    with _registry_lock:
+        items = list(_histograms.items())
+    return [(name, dict(labels), found) for (name, labels), found in sorted(items, key=lambda item: item[0])]
+
+
+def counters():
+    """
+    Return [(name, labels, counter)] for every counter created so far.
+    """
+    with _registry_lock:
+        items = list(_counters.items())
+    return [(name, dict(labels), found) for (name, labels), found in sorted(items, key=lambda item: item[0])]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(samples=()):
+    """
+    Render every histogram and counter, plus samples given as (name, type,
+    labels, value) for values read at scrape time, in the Prometheus text
+    exposition format.
+    """
+    families = {}  # name -> (type, lines)
+
+    def add(name, kind, line):
+        families.setdefault(name, (kind, []))[1].append(line)
+
+    for name, labels, found in histograms():
+        for bound, total in found.cumulative():
+            add(name, 'histogram', f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {total}")
+        add(name, 'histogram', f"{name}_sum{_format_labels(labels)} {_format_value(found.sum)}")
+        add(name, 'histogram', f"{name}_count{_format_labels(labels)} {found.count}")
+    for name, labels, found in counters():
+        add(name, 'counter', f"{name}{_format_labels(labels)} {_format_value(found.value)}")
+    for name, kind, labels, value in samples:
+        if value is None:
+            continue
+        add(name, kind, f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    lines = []
+    for name, (kind, family_lines) in families.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(family_lines)
+    return '\n'.join(lines) + '\n'
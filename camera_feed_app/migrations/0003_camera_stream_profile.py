@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camera_feed_app', '0002_alter_machine_cluster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='channel',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='main_subtype',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='open_timeout_ms',
+            field=models.IntegerField(default=5000),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='read_timeout_ms',
+            field=models.IntegerField(default=5000),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='stream_path',
+            field=models.CharField(default='/cam/realmonitor?channel={channel}&subtype={subtype}', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='sub_subtype',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='transport',
+            field=models.CharField(choices=[('tcp', 'TCP'), ('udp', 'UDP')], default='tcp', max_length=3),
+        ),
+    ]
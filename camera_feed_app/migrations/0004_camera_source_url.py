@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camera_feed_app', '0003_camera_stream_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='source_url',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camera_feed_app', '0004_camera_source_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cluster',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+    ]
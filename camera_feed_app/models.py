@@ -1,7 +1,24 @@
+from functools import lru_cache
+from django.conf import settings
 from django.db import models
 
+# Requests at or below this width are served from the camera's sub-stream
+SUB_STREAM_MAX_WIDTH = getattr(settings, 'CAMERA_SUB_STREAM_MAX_WIDTH', 640)
+
+
+@lru_cache(maxsize=1024)
+def build_stream_url(username, password, ip_address, port, stream_path, channel, subtype):
+    """
+    Build an RTSP URL from a camera's stream profile. Cached, since every
+    stream request would otherwise rebuild the same string.
+    """
+    path = stream_path.format(channel=channel, subtype=subtype)
+    return f"rtsp://{username}:{password}@{ip_address}:{port}{path}"
+
+
 class Cluster(models.Model):
     name = models.CharField(max_length=255)  # Name of the cluster
+    priority = models.IntegerField(default=0)  # Streams of higher-priority clusters are degraded last under load
 
     def __str__(self):
         return self.name
@@ -14,6 +31,16 @@ class Machine(models.Model):
         return f"{self.name} ({self.cluster.name})"
 
 class Camera(models.Model):
+    MAIN_STREAM = 'main'
+    SUB_STREAM = 'sub'
+
+    TRANSPORT_TCP = 'tcp'
+    TRANSPORT_UDP = 'udp'
+    TRANSPORT_CHOICES = [
+        (TRANSPORT_TCP, 'TCP'),
+        (TRANSPORT_UDP, 'UDP'),
+    ]
+
     name = models.CharField(max_length=255)  # Name of the camera
     ip_address = models.CharField(max_length=15)  # IP address of the camera
     port = models.IntegerField(default=554)  # RTSP default port
@@ -21,5 +48,49 @@ class Camera(models.Model):
     password = models.CharField(max_length=255)  # Login password for camera
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='cameras', default='')  # Association with Machine
 
+    # Stream profile; the defaults match Dahua cameras
+    stream_path = models.CharField(max_length=255, default='/cam/realmonitor?channel={channel}&subtype={subtype}')  # RTSP path template
+    channel = models.IntegerField(default=1)  # Video channel on the camera or NVR
+    main_subtype = models.IntegerField(default=0)  # Subtype of the full-resolution stream
+    sub_subtype = models.IntegerField(default=1)  # Subtype of the low-resolution stream
+    transport = models.CharField(max_length=3, choices=TRANSPORT_CHOICES, default=TRANSPORT_TCP)  # RTSP transport
+    open_timeout_ms = models.IntegerField(default=5000)  # Timeout for opening the stream
+    read_timeout_ms = models.IntegerField(default=5000)  # Timeout for reading a frame
+    source_url = models.CharField(max_length=255, blank=True, default='')  # Video file or synthetic source used instead of RTSP, for tests and benchmarks
+
     def __str__(self):
         return self.name
+
+    def stream_url(self, profile=MAIN_STREAM):
+        """
+        RTSP URL of the main or sub stream, or the simulated source both
+        streams come from.
+        """
+        if self.source_url:
+            return self.source_url
+        subtype = self.sub_subtype if profile == self.SUB_STREAM else self.main_subtype
+        return build_stream_url(
+            self.username, self.password, self.ip_address, self.port,
+            self.stream_path, self.channel, subtype,
+        )
+
+    def capture_options(self):
+        """
+        Options for opening this camera's stream with OpenCV.
+        """
+        return {
+            "transport": self.transport,
+            "open_timeout_ms": self.open_timeout_ms,
+            "read_timeout_ms": self.read_timeout_ms,
+        }
+
+    @classmethod
+    def profile_for_width(cls, width):
+        """
+        Pick the stream to decode for a viewer asking for frames of width.
+        Small tiles come from the sub-stream so 1080p is never decoded just
+        to be scaled down.
+        """
+        if width is not None and width <= SUB_STREAM_MAX_WIDTH:
+            return cls.SUB_STREAM
+        return cls.MAIN_STREAM
@@ -0,0 +1,120 @@
+import cv2
+import logging
+import math
+import numpy as np
+import time
+from concurrent.futures import Future
+from django.conf import settings
+from .hub import DEFAULT_JPEG_QUALITY, Frame, FrameHub, attach, encode_frame, subscribe
+from .models import Camera
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Width of one tile in pixels when the viewer does not ask for one
+MOSAIC_TILE_WIDTH = getattr(settings, 'CAMERA_MOSAIC_TILE_WIDTH', 320)
+
+# Frames per second a mosaic is composed and sent at by default
+MOSAIC_FPS = getattr(settings, 'CAMERA_MOSAIC_FPS', 5)
+
+# Most cameras tiled into one mosaic
+MOSAIC_MAX_TILES = getattr(settings, 'CAMERA_MOSAIC_MAX_TILES', 36)
+
+
+class Mosaic(FrameHub):
+    """
+    Tiles the latest frames of several cameras into one preallocated canvas.
+
+    The canvas is updated in place at a fixed cadence, only where a camera
+    has produced a new frame, and encoded once per tick for all viewers.
+    """
+    def __init__(self, key, name, cameras, tile_width, fps, quality):
+        super().__init__(key, {'mosaic': name})
+        self.name = name
+        self.cameras = cameras[:MOSAIC_MAX_TILES]
+        self.tile_width = tile_width
+        self.tile_height = tile_width * 9 // 16
+        self.fps = fps
+        self.quality = quality
+
+        count = max(1, len(self.cameras))
+        self.columns = math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.columns)
+        self.canvas = np.zeros(
+            (self.rows * self.tile_height, self.columns * self.tile_width, 3), np.uint8
+        )
+        self._encoded = None
+
+    def __str__(self):
+        return f"{self.name} mosaic"
+
+    def request_encode(self, frame, quality=DEFAULT_JPEG_QUALITY, width=None):
+        # Every viewer gets the single encode made when the tick was composed
+        future = Future()
+        future.set_result(self._encoded)
+        return future
+
+    def _tile(self, index):
+        row, column = divmod(index, self.columns)
+        y = row * self.tile_height
+        x = column * self.tile_width
+        return self.canvas[y:y + self.tile_height, x:x + self.tile_width]
+
+    def _run(self):
+        profile = Camera.profile_for_width(self.tile_width)
+        members = [
+            subscribe(camera, profile, max_fps=self.fps, width=self.tile_width)
+            for camera in self.cameras
+        ]
+        interval = 1.0 / self.fps
+        seq = 0
+        try:
+            next_tick = time.monotonic()
+            while not self._stop.is_set():
+                changed = False
+                for index, member in enumerate(members):
+                    frame = member.poll()
+                    if frame is None:
+                        continue
+                    image = frame.resized(self.tile_width)
+                    if image.shape[:2] != (self.tile_height, self.tile_width):
+                        image = cv2.resize(
+                            image, (self.tile_width, self.tile_height), interpolation=cv2.INTER_AREA
+                        )
+                    self._tile(index)[:] = image
+                    changed = True
+
+                if changed or self._encoded is None:
+                    seq += 1
+                    frame = Frame(seq, self.canvas, time.time())
+                    started = time.monotonic()
+                    self._encoded = encode_frame(frame, self.quality)
+                    self.encode_seconds.observe(time.monotonic() - started)
+                    self.publish(frame)
+
+                next_tick += interval
+                delay = next_tick - time.monotonic()
+                if delay < 0:
+                    next_tick = time.monotonic()  # Running late; do not try to catch up
+                    delay = 0
+                self._stop.wait(delay)
+        except Exception as e:
+            logger.error(f"Error composing {self}: {e}")
+        finally:
+            for member in members:
+                member.close()
+            logger.info(f"Hub stopped for {self}")
+
+
+def subscribe_mosaic(kind, owner, cameras, tile_width=None, max_fps=None, quality=DEFAULT_JPEG_QUALITY):
+    """
+    Attach a viewer to the mosaic of a machine or cluster, starting it if
+    needed. Viewers asking for the same layout share one mosaic.
+    """
+    tile_width = tile_width or MOSAIC_TILE_WIDTH
+    fps = max_fps or MOSAIC_FPS
+    key = ('mosaic', kind, owner.pk, tile_width, fps, quality)
+    return attach(
+        key,
+        lambda: Mosaic(key, f"{kind} {owner.pk}", cameras, tile_width, fps, quality),
+    )
@@ -0,0 +1,51 @@
+import cv2
+import logging
+from django.conf import settings
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Mean absolute grey-level difference (0-255) below which a frame counts as
+# unchanged. 0 treats every frame as changed.
+CHANGE_THRESHOLD = getattr(settings, 'CAMERA_CHANGE_THRESHOLD', 2.0)
+
+# Width of the grayscale thumbnail frames are compared on
+CHANGE_SAMPLE_WIDTH = getattr(settings, 'CAMERA_CHANGE_SAMPLE_WIDTH', 64)
+
+
+class ChangeDetector:
+    """
+    Tells whether a frame differs visibly from the last frame that did.
+
+    Frames are compared as small grayscale thumbnails against a reference
+    that only moves on when a change is detected, so a slow drift still
+    adds up to a change eventually.
+    """
+    def __init__(self, threshold=CHANGE_THRESHOLD, sample_width=CHANGE_SAMPLE_WIDTH):
+        self.threshold = threshold
+        self.sample_width = sample_width
+        self.unchanged = 0
+        self._reference = None
+
+    def _sample(self, image):
+        height, width = image.shape[:2]
+        sample_height = max(1, round(height * self.sample_width / width))
+        small = cv2.resize(image, (self.sample_width, sample_height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def update(self, image):
+        """
+        Return True if image should be treated as a new scene.
+        """
+        if not self.threshold:
+            return True
+        sample = self._sample(image)
+        reference = self._reference
+        if reference is not None and reference.shape == sample.shape:
+            if cv2.absdiff(sample, reference).mean() < self.threshold:
+                self.unchanged += 1
+                return False
+        self._reference = sample
+        return True
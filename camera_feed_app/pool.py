@@ -0,0 +1,164 @@
+import cv2
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from .sources import open_source
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Idle captures kept open at most, across all cameras
+POOL_MAX_SIZE = getattr(settings, 'CAMERA_CAPTURE_POOL_SIZE', 8)
+
+# Seconds an idle capture stays open before it is closed
+POOL_IDLE_SECONDS = getattr(settings, 'CAMERA_CAPTURE_IDLE_SECONDS', 10)
+
+# Frames a capture may queue internally, where the backend supports it
+CAPTURE_BUFFER_SIZE = getattr(settings, 'CAMERA_CAPTURE_BUFFER_SIZE', 1)
+
+
+# OpenCV reads FFmpeg options from the environment when a capture opens
+_ffmpeg_options_lock = threading.Lock()
+
+
+def open_capture(url, transport=None, open_timeout_ms=None, read_timeout_ms=None):
+    """
+    Open a VideoCapture with the given RTSP transport and timeouts.
+    Simulated sources (see sources.open_source) open without either.
+    """
+    simulated = open_source(url)
+    if simulated is not None:
+        return simulated
+
+    params = []
+    if open_timeout_ms:
+        params += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout_ms]
+    if read_timeout_ms:
+        params += [cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout_ms]
+    if transport is None:
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+    else:
+        with _ffmpeg_options_lock:
+            previous = os.environ.get('OPENCV_FFMPEG_CAPTURE_OPTIONS')
+            os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = f"rtsp_transport;{transport}"
+            try:
+                cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+            finally:
+                if previous is None:
+                    del os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS']
+                else:
+                    os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = previous
+
+    # Queue as few frames as the backend allows, so the next frame read is
+    # the freshest one
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, CAPTURE_BUFFER_SIZE)
+    return cap
+
+
+class CapturePool:
+    """
+    Keeps recently used VideoCapture objects open so the next user of the
+    same URL skips the RTSP handshake and codec probe.
+
+    Idle captures are closed once they have been idle for idle_seconds, and
+    the least recently used ones are closed first when more than max_size
+    are idle.
+    """
+    def __init__(self, max_size=POOL_MAX_SIZE, idle_seconds=POOL_IDLE_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._idle = OrderedDict()  # url -> (capture, idle since)
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def acquire(self, url, **options):
+        """
+        Return an open capture for url, reusing an idle one when available.
+        options are passed to open_capture when a new capture is needed.
+        """
+        with self._lock:
+            entry = self._idle.pop(url, None)
+        if entry is not None:
+            cap = entry[0]
+            if cap.isOpened():
+                with self._lock:
+                    self.hits += 1
+                logger.debug(f"Capture pool hit ({self.hits} hits, {self.misses} misses)")
+                return cap
+            cap.release()
+
+        with self._lock:
+            self.misses += 1
+        logger.debug(f"Capture pool miss ({self.hits} hits, {self.misses} misses)")
+        return open_capture(url, **options)
+
+    def release(self, url, cap):
+        """
+        Return a capture to the pool. Captures that are no longer open are
+        closed straight away.
+        """
+        if not cap.isOpened():
+            cap.release()
+            return
+
+        with self._lock:
+            replaced = self._idle.pop(url, None)
+            self._idle[url] = (cap, time.monotonic())
+            evicted = self._evict()
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(
+                    target=self._sweep, name="capture-pool-sweeper", daemon=True
+                )
+                self._sweeper.start()
+
+        if replaced is not None:
+            evicted.append(replaced[0])
+        for old in evicted:
+            old.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self):
+        """
+        Remove expired and over-budget captures. Must hold the lock; the
+        caller releases the returned captures after dropping it.
+        """
+        evicted = []
+        now = time.monotonic()
+        for url, (cap, idle_since) in list(self._idle.items()):
+            if now - idle_since >= self.idle_seconds:
+                del self._idle[url]
+                evicted.append(cap)
+        while len(self._idle) > self.max_size:
+            _, (cap, _) = self._idle.popitem(last=False)
+            evicted.append(cap)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _sweep(self):
+        while True:
+            time.sleep(1)
+            with self._lock:
+                evicted = self._evict()
+                empty = not self._idle
+            for cap in evicted:
+                cap.release()
+            if empty:
+                return
+
+
+# Process-wide pool shared by the stream views and the capture hubs
+capture_pool = CapturePool()
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from channels.layers import get_channel_layer
+from django.conf import settings
+from .hub import subscribe
+from .models import Camera
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Channel that watch requests are sent to when frames are published by a worker
+PUBLISHER_CHANNEL = getattr(settings, 'CAMERA_WS_PUBLISHER_CHANNEL', 'camera-publisher')
+
+# Seconds between two watch requests from a connected WebSocket client
+WATCH_INTERVAL = getattr(settings, 'CAMERA_WS_WATCH_INTERVAL', 5)
+
+# A publisher stops once no client has renewed its watch for this long
+WATCH_TTL = WATCH_INTERVAL * 3
+
+# Seconds a frame may take to reach the channel layer before it is abandoned
+SEND_TIMEOUT = 2
+
+
+def group_name(camera_id, options):
+    """
+    Channel layer group carrying one variant of a camera's frames.
+    """
+    return "camera.{}.{}.{}.{:g}".format(
+        camera_id,
+        options.get('width') or 'full',
+        options.get('quality') or 'default',
+        options.get('max_fps') or 0,
+    )
+
+
+class GroupPublisher:
+    """
+    Feeds one camera variant from the local capture hub into a channel layer
+    group, as raw JPEG bytes, for as long as some client keeps watching.
+    """
+    def __init__(self, camera, options, group, loop):
+        self.camera = camera
+        self.options = options
+        self.group = group
+        self.loop = loop
+        self.expires_at = 0
+        self._thread = threading.Thread(
+            target=self._run, name=f"ws-publisher-{group}", daemon=True
+        )
+
+    def touch(self):
+        self.expires_at = time.monotonic() + WATCH_TTL
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Publishing camera {self.camera.id} to group {self.group}")
+
+    def _run(self):
+        channel_layer = get_channel_layer()
+        profile = Camera.profile_for_width(self.options.get('width'))
+        subscriber = subscribe(self.camera, profile, **self.options)
+        try:
+            while time.monotonic() < self.expires_at:
+                try:
+                    frame = subscriber.get(timeout=1)
+                except queue.Empty:
+                    continue
+
+                encoded = subscriber.encode(frame)
+                # Channel layers are not thread-safe; send on the loop that owns it
+                started = time.monotonic()
+                future = asyncio.run_coroutine_threadsafe(
+                    channel_layer.group_send(
+                        self.group, {"type": "camera.frame", "jpeg": encoded.jpeg}
+                    ),
+                    self.loop,
+                )
+                future.result(SEND_TIMEOUT)
+                subscriber.hub.write_seconds.observe(time.monotonic() - started)
+                subscriber.hub.bytes_sent.inc(len(encoded.jpeg))
+        except Exception as e:
+            logger.error(f"Error publishing camera {self.camera.id}: {e}")
+        finally:
+            subscriber.close()
+            with _publishers_lock:
+                if _publishers.get(self.group) is self:
+                    del _publishers[self.group]
+            logger.info(f"Stopped publishing camera {self.camera.id} to group {self.group}")
+
+
+# Publishers running in this process, keyed by group name
+_publishers = {}
+_publishers_lock = threading.Lock()
+
+
+def watch(camera, options, loop):
+    """
+    Make sure the camera variant is being published to its group and renew
+    its lease. Must be given the event loop the channel layer is used from.
+    """
+    group = group_name(camera.id, options)
+    with _publishers_lock:
+        publisher = _publishers.get(group)
+        if publisher is None:
+            publisher = _publishers[group] = GroupPublisher(camera, options, group, loop)
+            publisher.touch()
+            publisher.start()
+        else:
+            publisher.touch()
+    return group
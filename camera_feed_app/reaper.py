@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from . import hub
+from .models import Camera
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Cameras whose main stream is decoded even without viewers, at
+# CAMERA_KEEP_WARM_FPS, so the first viewer never waits for an RTSP open.
+# Keys are 'cameras', 'machines' and 'clusters', each a list of IDs.
+KEEP_WARM = getattr(settings, 'CAMERA_KEEP_WARM', {})
+
+# Seconds between two sweeps for idle hubs and abandoned viewers
+REAP_INTERVAL = getattr(settings, 'CAMERA_REAP_INTERVAL', 5)
+
+# Seconds between two reloads of the keep-warm cameras from the database
+KEEP_WARM_RELOAD_SECONDS = getattr(settings, 'CAMERA_KEEP_WARM_RELOAD_SECONDS', 30)
+
+
+def keep_warm_cameras(policy=KEEP_WARM):
+    """
+    Cameras selected by the keep-warm policy, directly or through their
+    machine or cluster.
+    """
+    query = (
+        Q(pk__in=policy.get('cameras', []))
+        | Q(machine_id__in=policy.get('machines', []))
+        | Q(machine__cluster_id__in=policy.get('clusters', []))
+    )
+    return list(Camera.objects.filter(query))
+
+
+class Reaper:
+    """
+    Background thread that stops hubs once they have lingered without
+    viewers for CAMERA_HUB_LINGER_SECONDS, detaches viewers that stopped
+    reading, and keeps the keep-warm cameras decoding.
+    """
+    def __init__(self, interval=REAP_INTERVAL, policy=KEEP_WARM):
+        self.interval = interval
+        self.policy = policy
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="hub-reaper", daemon=True)
+        # Hubs may now outlive their last viewer; this thread stops them
+        hub.linger = True
+        self._thread.start()
+        logger.info("Hub reaper started")
+
+    def _run(self):
+        warm_keys = set()
+        reload_every = max(1, round(KEEP_WARM_RELOAD_SECONDS / self.interval))
+        sweeps = 0
+        while True:
+            try:
+                if self.policy and sweeps % reload_every == 0:
+                    close_old_connections()
+                    warm_keys = {
+                        hub.keep_warm(camera, Camera.MAIN_STREAM).key
+                        for camera in keep_warm_cameras(self.policy)
+                    }
+                hub.reap(warm_keys)
+            except Exception as e:
+                logger.error(f"Error in hub reaper: {e}")
+            sweeps += 1
+            time.sleep(self.interval)
+
+
+# Process-wide reaper, started by the ASGI and WSGI entry points
+reaper = Reaper()
+
+
+def start():
+    reaper.start()
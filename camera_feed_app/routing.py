@@ -1,6 +1,11 @@
-# from django.urls import re_path
-# from .consumers import CameraStreamWebSocketConsumer
+from django.urls import re_path
+from .consumers import CameraStreamConsumer, CameraPublisherConsumer
+from .publisher import PUBLISHER_CHANNEL
 
-# websocket_urlpatterns = [
-#     re_path(r'ws/camera/(?P<camera_id>\d+)/stream/$', CameraStreamWebSocketConsumer.as_asgi())
-# ]
+websocket_urlpatterns = [
+    re_path(r'ws/camera/(?P<camera_id>\d+)/stream/$', CameraStreamConsumer.as_asgi()),
+]
+
+channel_routes = {
+    PUBLISHER_CHANNEL: CameraPublisherConsumer.as_asgi(),
+}
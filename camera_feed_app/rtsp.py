@@ -0,0 +1,183 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import re
+import time
+from django.conf import settings
+from .sources import source_available
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Seconds a whole probe, connect included, may take
+PROBE_TIMEOUT = getattr(settings, 'CAMERA_RTSP_PROBE_TIMEOUT', 3)
+
+# Largest RTSP response header block read from a camera
+MAX_HEADER_BYTES = 16 * 1024
+
+USER_AGENT = 'camera-feed-probe'
+
+_AUTH_PARAM = re.compile(r'(\w+)\s*=\s*(?:"([^"]*)"|([^,\s]*))')
+
+
+class RTSPError(Exception):
+    """
+    Raised when a camera answers with something that is not RTSP.
+    """
+
+
+class ProbeResult:
+    """
+    Outcome of an RTSP probe. status_code is that of the last response;
+    latency_ms is the round trip of the OPTIONS request.
+    """
+    def __init__(self, online, status_code=None, latency_ms=None, error=None):
+        self.online = online
+        self.status_code = status_code
+        self.latency_ms = latency_ms
+        self.error = error
+
+    def __repr__(self):
+        return f"ProbeResult(online={self.online}, status_code={self.status_code}, latency_ms={self.latency_ms})"
+
+
+def _md5(*parts):
+    return hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+
+def digest_authorization(challenge, method, uri, username, password, nc=1):
+    """
+    Build the Authorization header answering a Digest WWW-Authenticate
+    challenge (RFC 2617, MD5).
+    """
+    params = {name: quoted or plain for name, quoted, plain in _AUTH_PARAM.findall(challenge)}
+    realm = params.get('realm', '')
+    nonce = params.get('nonce', '')
+    ha1 = _md5(username, realm, password)
+    ha2 = _md5(method, uri)
+    fields = [
+        f'username="{username}"', f'realm="{realm}"', f'nonce="{nonce}"', f'uri="{uri}"',
+    ]
+    qop = params.get('qop')
+    if qop and 'auth' in [value.strip() for value in qop.split(',')]:
+        cnonce = os.urandom(8).hex()
+        nc_value = f"{nc:08x}"
+        response = _md5(ha1, nonce, nc_value, cnonce, 'auth', ha2)
+        fields += ['qop=auth', f'nc={nc_value}', f'cnonce="{cnonce}"']
+    else:
+        response = _md5(ha1, nonce, ha2)
+    fields.append(f'response="{response}"')
+    if 'opaque' in params:
+        fields.append(f'opaque="{params["opaque"]}"')
+    return 'Digest ' + ', '.join(fields)
+
+
+class RTSPConnection:
+    """
+    A minimal RTSP client: just enough to send requests and read responses.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.cseq = 0
+
+    async def request(self, method, uri, headers=None):
+        """
+        Send a request and return (status code, headers, body).
+        """
+        self.cseq += 1
+        lines = [f"{method} {uri} RTSP/1.0", f"CSeq: {self.cseq}", f"User-Agent: {USER_AGENT}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        await self.writer.drain()
+
+        try:
+            head = await self.reader.readuntil(b'\r\n\r\n')
+        except asyncio.LimitOverrunError:
+            raise RTSPError("Response headers too large.")
+        except asyncio.IncompleteReadError:
+            raise RTSPError("Connection closed by the camera.")
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        parts = status_line.split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('RTSP/') or not parts[1].isdigit():
+            raise RTSPError(f"Not an RTSP response: {status_line[:80]!r}")
+
+        response_headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                # Keep the first value; cameras may offer several challenges
+                response_headers.setdefault(name.strip().lower(), value.strip())
+        length = int(response_headers.get('content-length') or 0)
+        body = await self.reader.readexactly(length) if length else b''
+        return int(parts[1]), response_headers, body
+
+    def close(self):
+        self.writer.close()
+
+
+def _authorization(challenge, method, uri, username, password):
+    if challenge.lower().startswith('digest'):
+        return digest_authorization(challenge, method, uri, username, password)
+    credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return f"Basic {credentials}"
+
+
+async def _probe(host, port, path, username, password, describe):
+    uri = f"rtsp://{host}:{port}{path}"
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_HEADER_BYTES)
+    connection = RTSPConnection(reader, writer)
+    try:
+        started = time.monotonic()
+        status_code, headers, _ = await connection.request('OPTIONS', uri)
+        latency_ms = round((time.monotonic() - started) * 1000, 1)
+        if not describe:
+            # Any RTSP answer, even 401, means the camera is up
+            return ProbeResult(True, status_code, latency_ms)
+
+        accept = {'Accept': 'application/sdp'}
+        status_code, headers, _ = await connection.request('DESCRIBE', uri, accept)
+        challenge = headers.get('www-authenticate')
+        if status_code == 401 and challenge and username:
+            authorization = _authorization(challenge, 'DESCRIBE', uri, username, password)
+            status_code, headers, _ = await connection.request(
+                'DESCRIBE', uri, {**accept, 'Authorization': authorization}
+            )
+        error = None if status_code == 200 else f"DESCRIBE returned {status_code}"
+        return ProbeResult(status_code == 200, status_code, latency_ms, error)
+    finally:
+        connection.close()
+
+
+async def probe(host, port, path='/', username='', password='', describe=False, timeout=PROBE_TIMEOUT):
+    """
+    Check an RTSP server with OPTIONS and, if describe is set, an
+    authenticated DESCRIBE of path. Never raises; failures and timeouts
+    come back as an offline ProbeResult.
+    """
+    try:
+        return await asyncio.wait_for(
+            _probe(host, port, path, username, password, describe), timeout
+        )
+    except asyncio.TimeoutError:
+        return ProbeResult(False, error=f"No answer within {timeout} seconds.")
+    except (OSError, RTSPError, ValueError) as e:
+        return ProbeResult(False, error=str(e) or e.__class__.__name__)
+
+
+async def probe_camera(camera, describe=True, timeout=PROBE_TIMEOUT):
+    """
+    Probe a camera's main stream without decoding anything.
+    """
+    if camera.source_url:
+        # Simulated cameras have no RTSP server to ask
+        if source_available(camera.source_url):
+            return ProbeResult(True)
+        return ProbeResult(False, error=f"Source {camera.source_url} not available.")
+    path = camera.stream_path.format(channel=camera.channel, subtype=camera.main_subtype)
+    return await probe(
+        camera.ip_address, camera.port, path, camera.username, camera.password,
+        describe=describe, timeout=timeout,
+    )
@@ -0,0 +1,208 @@
+import logging
+import numpy as np
+import time
+from multiprocessing import resource_tracker, shared_memory
+from django.conf import settings
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# Frames kept per ring. A reader's frame stays intact until the writer has
+# published this many newer ones.
+RING_SLOTS = getattr(settings, 'CAMERA_SHM_SLOTS', 8)
+
+# Seconds between two checks for a new frame while a reader waits
+POLL_INTERVAL = 0.01
+
+MAGIC = b'CAMF'
+GONE = b'GONE'
+
+# Header layout: magic, slots, width, height, channels, reserved, latest seq
+_HEADER_SIZE = 32
+_LATEST_OFFSET = 24
+
+
+def ring_name(camera_id, profile):
+    return f"camfeed_{camera_id}_{profile}"
+
+
+def ring_exists(name):
+    try:
+        segment = _attach(name)
+    except FileNotFoundError:
+        return False
+    alive = bytes(segment.buf[:4]) == MAGIC
+    segment.close()
+    return alive
+
+
+def _attach(name):
+    segment = shared_memory.SharedMemory(name=name)
+    # Readers must not unlink the writer's segment when they exit
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+class _Ring:
+    """
+    NumPy views onto a shared memory segment laid out as a frame ring.
+    """
+    def __init__(self, segment, slots, height, width, channels):
+        buf = segment.buf
+        self.segment = segment
+        self.slots = slots
+        self.shape = (height, width, channels)
+        self.latest = np.ndarray((1,), np.uint64, buffer=buf, offset=_LATEST_OFFSET)
+        self.slot_seq = np.ndarray((slots,), np.uint64, buffer=buf, offset=_HEADER_SIZE)
+        self.slot_time = np.ndarray((slots,), np.float64, buffer=buf, offset=_HEADER_SIZE + 8 * slots)
+        self.frames = np.ndarray(
+            (slots, height, width, channels), np.uint8, buffer=buf, offset=_data_offset(slots)
+        )
+
+    def release(self):
+        # Views must go before the segment can be closed
+        self.latest = self.slot_seq = self.slot_time = self.frames = None
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # Frames still in use keep the mapping alive until they are freed
+
+
+def _data_offset(slots):
+    offset = _HEADER_SIZE + 16 * slots
+    return (offset + 63) // 64 * 64
+
+
+class SharedFrameWriter:
+    """
+    Publishes frames of one camera stream into a named shared memory ring.
+    """
+    def __init__(self, name, shape, slots=RING_SLOTS):
+        height, width, channels = shape
+        size = _data_offset(slots) + slots * height * width * channels
+        try:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by an ingest process that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        segment.buf[4:_LATEST_OFFSET] = np.array(
+            [slots, width, height, channels, 0], np.uint32
+        ).tobytes()
+        self.name = name
+        self.shape = tuple(shape)
+        self.seq = 0
+        self._ring = _Ring(segment, slots, height, width, channels)
+        self._ring.latest[0] = 0
+        segment.buf[:4] = MAGIC
+
+    def write(self, image, timestamp):
+        ring = self._ring
+        self.seq += 1
+        slot = self.seq % ring.slots
+        ring.slot_seq[slot] = 0  # Mark the slot as being written
+        ring.frames[slot][...] = image
+        ring.slot_time[slot] = timestamp
+        ring.slot_seq[slot] = self.seq
+        ring.latest[0] = self.seq
+
+    def close(self):
+        segment = self._ring.segment
+        segment.buf[:4] = GONE  # Tell readers to let go and reattach
+        self._ring.release()
+        segment.unlink()
+
+
+class SharedFrameReader:
+    """
+    Reads the newest frame of a shared memory ring without copying it.
+    """
+    def __init__(self, name):
+        segment = _attach(name)
+        if bytes(segment.buf[:4]) != MAGIC:
+            segment.close()
+            raise FileNotFoundError(name)
+        slots, width, height, channels = np.frombuffer(
+            segment.buf[4:20], np.uint32
+        ).tolist()
+        self.name = name
+        self.last_seq = 0
+        self._ring = _Ring(segment, slots, height, width, channels)
+
+    @property
+    def is_alive(self):
+        return bytes(self._ring.segment.buf[:4]) == MAGIC
+
+    def read_latest(self):
+        """
+        Return (image, timestamp) for a frame newer than the last one read,
+        or None. The image is a view into shared memory.
+        """
+        ring = self._ring
+        seq = int(ring.latest[0])
+        if seq == self.last_seq:
+            return None
+        slot = seq % ring.slots
+        if int(ring.slot_seq[slot]) != seq:
+            return None  # Overwritten since; the next call sees the newer one
+        self.last_seq = seq
+        return ring.frames[slot], float(ring.slot_time[slot])
+
+    def close(self):
+        self._ring.release()
+
+
+class SharedFrameCapture:
+    """
+    A stand-in for cv2.VideoCapture that reads a camera stream published by
+    the ingest daemon, so capture hubs work the same either way.
+    """
+    def __init__(self, name, read_timeout_ms=5000):
+        self.name = name
+        self.read_timeout = read_timeout_ms / 1000
+        self.timestamp = None
+        self._grabbed = None
+        try:
+            self._reader = SharedFrameReader(name)
+        except FileNotFoundError:
+            self._reader = None
+
+    def isOpened(self):
+        return self._reader is not None
+
+    def read(self):
+        deadline = time.monotonic() + self.read_timeout
+        while self._reader is not None:
+            if not self._reader.is_alive:
+                # Writer recreated the ring, e.g. after a resolution change
+                self._reader.close()
+                try:
+                    self._reader = SharedFrameReader(self.name)
+                except FileNotFoundError:
+                    self._reader = None
+                    break
+            latest = self._reader.read_latest()
+            if latest is not None:
+                image, self.timestamp = latest
+                return True, image
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+        return False, None
+
+    def grab(self):
+        # Reading is zero-copy, so grabbing is reading and keeping the frame
+        ret, self._grabbed = self.read()
+        return ret
+
+    def retrieve(self):
+        image, self._grabbed = self._grabbed, None
+        return image is not None, image
+
+    def release(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
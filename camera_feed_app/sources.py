@@ -0,0 +1,165 @@
+import cv2
+import logging
+import numpy as np
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_SCHEME = 'synthetic'
+FILE_SCHEME = 'file'
+
+# Frame rate of sources that do not say otherwise
+DEFAULT_SOURCE_FPS = 25
+
+
+def synthetic_image(width, height, seed):
+    """
+    A frame with gradients and noise, so JPEG has realistic work to do.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+class _PacedCapture:
+    """
+    Base of the simulated captures: grab() blocks until the next frame is
+    due, like a camera stream would, and never runs ahead of fps.
+    """
+    def __init__(self, fps):
+        self.fps = fps or DEFAULT_SOURCE_FPS
+        self._next_frame = None
+
+    def _wait_for_frame(self):
+        now = time.monotonic()
+        if self._next_frame is None or now - self._next_frame > 1:
+            # First frame, or a reader that stalled: do not burst to catch up
+            self._next_frame = now
+        elif self._next_frame > now:
+            time.sleep(self._next_frame - now)
+        self._next_frame += 1 / self.fps
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set(self, prop, value):
+        return False
+
+
+class SyntheticCapture(_PacedCapture):
+    """
+    A VideoCapture stand-in that generates frames: a noisy gradient with a
+    bar sweeping across it, so every frame differs from the last.
+    """
+    def __init__(self, width=1920, height=1080, fps=DEFAULT_SOURCE_FPS, seed=0):
+        super().__init__(fps)
+        self.width = width
+        self.height = height
+        self._background = synthetic_image(width, height, seed)
+        self._seq = 0
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        if not self._opened:
+            return False
+        self._wait_for_frame()
+        self._seq += 1
+        return True
+
+    def retrieve(self):
+        if not self._opened or not self._seq:
+            return False, None
+        image = self._background.copy()
+        # Wide enough a step that the change detector sees a moving scene
+        step = max(8, self.width // 32)
+        x = self._seq * step % self.width
+        image[:, x:x + step] = 255
+        return True, image
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+        }.get(prop, 0)
+
+    def release(self):
+        self._opened = False
+        self._background = None
+
+
+class VideoFileCapture(_PacedCapture):
+    """
+    Plays a local video file at its own frame rate, or fps if given, and
+    starts over at the end when loop is set.
+    """
+    def __init__(self, path, fps=None, loop=True):
+        self.path = path
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path)
+        super().__init__(fps or self._cap.get(cv2.CAP_PROP_FPS))
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def grab(self):
+        self._wait_for_frame()
+        if self._cap.grab():
+            return True
+        if not self.loop:
+            return False
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self._cap.grab()
+
+    def retrieve(self):
+        return self._cap.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self._cap.get(prop)
+
+    def release(self):
+        self._cap.release()
+
+
+def open_source(url):
+    """
+    Open a simulated camera from a source URL, or return None for any other
+    URL:
+
+        synthetic://1920x1080?fps=25&seed=3
+        file:///srv/videos/line3.mp4?fps=15&loop=0
+    """
+    parts = urlsplit(url)
+    query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+    fps = float(query['fps']) if 'fps' in query else None
+    if parts.scheme == SYNTHETIC_SCHEME:
+        width, _, height = (parts.netloc or '1920x1080').partition('x')
+        return SyntheticCapture(
+            int(width), int(height), fps or DEFAULT_SOURCE_FPS, int(query.get('seed', 0))
+        )
+    if parts.scheme == FILE_SCHEME:
+        return VideoFileCapture(parts.path, fps, query.get('loop', '1') != '0')
+    return None
+
+
+def source_available(url):
+    """
+    Whether a simulated source can be opened, without opening it.
+    """
+    parts = urlsplit(url)
+    if parts.scheme == FILE_SCHEME:
+        return os.path.isfile(parts.path)
+    return parts.scheme == SYNTHETIC_SCHEME
@@ -18,7 +18,7 @@ def check_camera_status(camera_url):
 def stream_camera_feed(camera):
     try:
         # Construct the RTSP URL using the camera's credentials
-        camera_url = f"rtsp://{camera.username}:{camera.password}@{camera.ip_address}:{camera.port}/cam/realmonitor?channel=1&subtype=0"
+        camera_url = camera.stream_url()
         logger.info(f"Checking camera connection at {camera_url}")
         
         # Check if the camera is active
@@ -0,0 +1,174 @@
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+
+# Set up logging for debugging
+logger = logging.getLogger(__name__)
+
+# First reconnect delay in seconds; doubles with every consecutive failure
+RECONNECT_BASE_DELAY = getattr(settings, 'CAMERA_RECONNECT_BASE_DELAY', 0.5)
+
+# Longest wait between two reconnect attempts, in seconds
+RECONNECT_MAX_DELAY = getattr(settings, 'CAMERA_RECONNECT_MAX_DELAY', 30)
+
+# Consecutive failures after which a camera is considered offline
+CIRCUIT_FAILURE_THRESHOLD = getattr(settings, 'CAMERA_CIRCUIT_FAILURE_THRESHOLD', 5)
+
+# Seconds an offline camera rejects new viewers before it is tried again
+CIRCUIT_RESET_SECONDS = getattr(settings, 'CAMERA_CIRCUIT_RESET_SECONDS', 30)
+
+# Minimum seconds between two repeated warnings about the same camera
+LOG_INTERVAL_SECONDS = getattr(settings, 'CAMERA_LOG_INTERVAL_SECONDS', 30)
+
+
+class CameraOffline(Exception):
+    """
+    Raised when a camera's circuit is open and new viewers are turned away.
+    """
+    def __init__(self, camera_id, retry_after):
+        super().__init__(f"Camera {camera_id} is offline.")
+        self.camera_id = camera_id
+        self.retry_after = retry_after
+
+
+class ThrottledLogger:
+    """
+    Logs a repeated message at most once per interval, with a count of the
+    messages suppressed in between.
+    """
+    def __init__(self, interval=LOG_INTERVAL_SECONDS):
+        self.interval = interval
+        self._last = {}  # message -> (last logged at, suppressed count)
+        self._lock = threading.Lock()
+
+    def log(self, level, message):
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(message, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._last[message] = (last, suppressed + 1)
+                return
+            self._last[message] = (now, 0)
+        if suppressed:
+            message = f"{message} ({suppressed} similar messages suppressed)"
+        logger.log(level, message)
+
+
+class CameraSupervisor:
+    """
+    Tracks connection failures for one camera. It hands out jittered
+    exponential reconnect delays and acts as a circuit breaker: after
+    failure_threshold consecutive failures the camera is marked offline and
+    new viewers fail fast until reset_seconds have passed.
+    """
+    def __init__(
+        self,
+        camera_id,
+        base_delay=RECONNECT_BASE_DELAY,
+        max_delay=RECONNECT_MAX_DELAY,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=CIRCUIT_RESET_SECONDS,
+    ):
+        self.camera_id = camera_id
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.reconnect_attempts = 0
+        self.circuit_opens = 0
+        self.log = ThrottledLogger()
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_offline(self):
+        return self._opened_at is not None
+
+    def record_success(self):
+        if self.consecutive_failures == 0:
+            return  # Fast path for every decoded frame
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Camera {self.camera_id} is back online")
+            self.consecutive_failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """
+        Count a failed open or read and return how long to wait before the
+        next reconnect attempt.
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            self.reconnect_attempts += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.circuit_opens += 1
+                    logger.warning(
+                        f"Camera {self.camera_id} marked offline after "
+                        f"{self.consecutive_failures} consecutive failures"
+                    )
+                self._opened_at = time.monotonic()
+            exponent = min(self.consecutive_failures - 1, 16)
+        delay = min(self.max_delay, self.base_delay * 2 ** exponent)
+        return delay * random.uniform(0.5, 1.0)
+
+    def retry_after(self):
+        """
+        Seconds until an offline camera will be tried again.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def allow_attempt(self):
+        """
+        Whether a new viewer may try to open the camera. Once the reset
+        period is over a single viewer is let through to test the camera;
+        everyone else keeps failing fast until that attempt reports back.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._opened_at = time.monotonic()
+            return True
+
+    def check(self):
+        """
+        Raise CameraOffline if new viewers of this camera should fail fast.
+        """
+        if not self.allow_attempt():
+            raise CameraOffline(self.camera_id, self.retry_after())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "offline": self._opened_at is not None,
+                "consecutive_failures": self.consecutive_failures,
+                "reconnect_attempts": self.reconnect_attempts,
+                "circuit_opens": self.circuit_opens,
+            }
+
+
+# Process-wide supervisors, keyed by camera ID and shared by all its streams
+_supervisors = {}
+_supervisors_lock = threading.Lock()
+
+
+def get_supervisor(camera_id):
+    with _supervisors_lock:
+        supervisor = _supervisors.get(camera_id)
+        if supervisor is None:
+            supervisor = _supervisors[camera_id] = CameraSupervisor(camera_id)
+        return supervisor
+
+
+def all_supervisors():
+    with _supervisors_lock:
+        return list(_supervisors.values())
@@ -4,7 +4,13 @@ from .views import (
     ClusterViewSet,
     MachineViewSet,
     CameraViewSet,
-    CameraStreamView
+    CameraStreamView,
+    AsyncCameraStreamView,
+    CameraSnapshotView,
+    CameraReplayView,
+    CameraMetricsView,
+    MetricsView,
+    MosaicStreamView,
 )
 
 # Create a router to automatically generate URLs for ViewSets
@@ -17,5 +23,12 @@ router.register(r'cameras', CameraViewSet, basename='cameras')
 # Extend urlpatterns to include hierarchical filtering endpoints
 urlpatterns = router.urls + [
     path('camera/<int:pk>/stream/', CameraStreamView.as_view(), name='camera-stream'),
+    path('camera/<int:pk>/stream/async/', AsyncCameraStreamView.as_view(), name='camera-stream-async'),
+    path('camera/<int:pk>/snapshot.jpg', CameraSnapshotView.as_view(), name='camera-snapshot'),
+    path('camera/<int:pk>/replay/', CameraReplayView.as_view(), name='camera-replay'),
+    path('camera/<int:pk>/metrics/', CameraMetricsView.as_view(), name='camera-metrics'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('machines/<int:pk>/mosaic/', MosaicStreamView.as_view(kind='machine'), name='machine-mosaic'),
+    path('clusters/<int:pk>/mosaic/', MosaicStreamView.as_view(kind='cluster'), name='cluster-mosaic'),
 ]
 
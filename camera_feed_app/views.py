@@ -1,6 +1,10 @@
-from django.http import StreamingHttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import http_date, parse_http_date_safe
+from django.conf import settings
+from django.views import View
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
@@ -11,14 +15,63 @@ from .serializers import (
     MachineSerializer,
     CameraSerializer,
 )
+from .hub import (
+    CameraHub,
+    DEFAULT_JPEG_QUALITY,
+    Frame,
+    cached_frame,
+    encode_frame,
+    get_running_hub,
+    ingest_available,
+    mjpeg_part,
+    open_stream_capture,
+    recent_snapshot,
+    lifecycle_stats,
+    release_stream_capture,
+    running_hubs,
+    store_snapshot,
+    stream_executor,
+    subscribe,
+)
+from .admission import StreamRejected, admission
+from .dvr import all_buffers, find_buffer
+from .encoder import encode_pool
+from .governor import governor
+from .health import get_monitor
+from .metrics import counters, histograms, observe, render_prometheus
+from .mosaic import subscribe_mosaic
+from .pool import capture_pool
+from .supervisor import CameraOffline, all_supervisors, get_supervisor
 
+import asyncio
+import functools
+import itertools
 import logging
-import cv2
+import math
+import re
+import time
+import queue
 
 
 # Set up logging for debugging
 logger = logging.getLogger(__name__)
 
+# Seconds a stream waits for a frame before checking again
+FRAME_WAIT_TIMEOUT = 5
+
+# Bounds accepted for the stream negotiation query parameters
+STREAM_WIDTH_RANGE = (16, 3840)
+STREAM_MAX_FPS_RANGE = (0.1, 60)
+STREAM_QUALITY_RANGE = (1, 100)
+
+# Seconds a snapshot may be served from cache, counted from its capture time
+SNAPSHOT_MAX_AGE = getattr(settings, 'CAMERA_SNAPSHOT_MAX_AGE', 2)
+
+# Replay start offsets like "-60s", "-2m" or "-90" (seconds), and the
+# playback speeds accepted
+REPLAY_SINCE_PATTERN = re.compile(r'^-?(\d+(?:\.\d+)?)([sm]?)$')
+REPLAY_SPEED_RANGE = (0.1, 32)
+
 
 class ClusterViewSet(viewsets.ViewSet):
     """
@@ -179,6 +232,12 @@ class CameraViewSet(viewsets.ViewSet):
                 description="Filter machines by cluster ID", 
                 type=openapi.TYPE_INTEGER, 
                 required=False
+            ),
+            openapi.Parameter(
+                'include_status', openapi.IN_QUERY,
+                description="Add each camera's cached health status",
+                type=openapi.TYPE_BOOLEAN,
+                required=False
             )
         ]
     )
@@ -189,7 +248,36 @@ class CameraViewSet(viewsets.ViewSet):
         else:
             cameras = Camera.objects.all()
         serializer = CameraSerializer(cameras, many=True)
-        return Response({"results": serializer.data,"status":status.HTTP_200_OK})
+        results = serializer.data
+        if request.query_params.get('include_status') in ('1', 'true', 'True'):
+            monitor = get_monitor()
+            for camera in results:
+                camera['status'] = monitor.status(camera['id'])
+        return Response({"results": results,"status":status.HTTP_200_OK})
+
+    @swagger_auto_schema(
+        operation_description="Cached health status of every camera, refreshed in the background.",
+        manual_parameters=[
+            openapi.Parameter(
+                'machine_id', openapi.IN_QUERY,
+                description="Only cameras of this machine",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            )
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='status')
+    def health(self, request):
+        machine_id = request.query_params.get('machine_id')
+        cameras = Camera.objects.all()
+        if machine_id:
+            cameras = cameras.filter(machine_id=machine_id)
+        monitor = get_monitor()
+        results = [
+            {"camera_id": camera_id, **monitor.status(camera_id)}
+            for camera_id in cameras.order_by('id').values_list('id', flat=True)
+        ]
+        return Response({"results": results, "status": status.HTTP_200_OK})
 
     @swagger_auto_schema(
         operation_description="Retrieve a specific camera by ID.",
@@ -247,67 +335,163 @@ class CameraViewSet(viewsets.ViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
-def check_camera_status(camera_url):
+def check_camera_status(camera_url, **capture_options):
     """
     Check if the camera is accessible and return its status.
+    The probed capture is kept in the pool so the stream can reuse it.
     """
-    cap = cv2.VideoCapture(camera_url)
+    cap = capture_pool.acquire(camera_url, **capture_options)
     if cap.isOpened():
-        cap.release()
+        capture_pool.release(camera_url, cap)
         return True  # Camera is active
+    cap.release()
     return False  # Camera is inactive
 
-def stream_camera_feed(camera):
+def parse_stream_options(query_params):
+    """
+    Read the width, max_fps and quality query parameters of a stream request.
+    Raises ValueError with a client-facing message if any of them is invalid.
+    """
+    options = {}
+    for name, cast, (low, high) in (
+        ('width', int, STREAM_WIDTH_RANGE),
+        ('max_fps', float, STREAM_MAX_FPS_RANGE),
+        ('quality', int, STREAM_QUALITY_RANGE),
+    ):
+        value = query_params.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            value = cast(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number.")
+        if not low <= value <= high:
+            raise ValueError(f"{name} must be between {low} and {high}.")
+        options[name] = value
+    return options
+
+
+class StreamTimer:
+    """
+    Measures how long a stream request waited for its first byte and its
+    first live frame, counted from when the request reached the view.
+    """
+    def __init__(self, name, started=None):
+        self.name = name
+        self.started = started or time.monotonic()
+        self.first_byte = None
+
+    def sent(self, cached=False):
+        """
+        Record a part about to be sent; cached parts come from before the
+        request arrived. Returns True for the first live frame.
+        """
+        elapsed = time.monotonic() - self.started
+        if self.first_byte is None:
+            self.first_byte = elapsed
+            observe('stream_first_byte_seconds', elapsed, source='cache' if cached else 'live')
+        if cached:
+            return False
+        observe('stream_first_live_frame_seconds', elapsed)
+        logger.info(
+            f"Stream of {self.name}: first byte after {self.first_byte * 1000:.0f} ms, "
+            f"first live frame after {elapsed * 1000:.0f} ms"
+        )
+        return True
+
+
+def generate_mjpeg(attach_viewer, first=None, timer=None):
     """
-    Streams the video feed from the camera.
+    Yield multipart MJPEG parts for the subscriber returned by attach_viewer().
+    The viewer is attached on first iteration and detached when the client
+    goes away. A cached first frame, if given, is sent right away while the
+    live stream starts.
     """
+    subscriber = attach_viewer()
+    hub = subscriber.hub
+    timer = timer or StreamTimer(hub)
     try:
-        # Construct the RTSP URL using the camera's credentials
-        camera_url = f"rtsp://{camera.username}:{camera.password}@{camera.ip_address}:{camera.port}/cam/realmonitor?channel=1&subtype=0"
-        logger.info(f"Checking camera connection at {camera_url}")
-        
-        # Check if the camera is active
-        if not check_camera_status(camera_url):
-            logger.error(f"Unable to connect to the camera feed at {camera_url}")
-            return None
-        
-        # Function to stream the video as MJPEG
-        def generate():
-            cap = cv2.VideoCapture(camera_url)
+        if first is not None:
+            timer.sent(cached=True)
+            part = first.part()
+            yield part
+            hub.bytes_sent.inc(len(part))
+
+        live = False
+        while True:
             try:
-                while True:
-                    if not cap.isOpened():
-                        logger.warning("Camera feed disconnected. Attempting to reconnect...")
-                        cap.release()
-                        cap = cv2.VideoCapture(camera_url)
-                        continue
-                    
-                    ret, frame = cap.read()
-                    if not ret:
-                        logger.warning("Failed to read frame. Reconnecting...")
-                        cap.release()
-                        cap = cv2.VideoCapture(camera_url)
-                        continue
-                    
-                    _, jpeg = cv2.imencode('.jpg', frame)
-                    frame = jpeg.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n'
-                           b'Content-Length: ' + str(len(frame)).encode() + b'\r\n\r\n' +
-                           frame +
-                           b'\r\n')
-            except GeneratorExit:
-                logger.info("Client disconnected. Closing stream.")
-            except Exception as e:
-                logger.error(f"Error in stream: {e}")
-            finally:
-                cap.release()
+                frame = subscriber.get(timeout=FRAME_WAIT_TIMEOUT)
+            except queue.Empty:
+                continue
+
+            part = subscriber.encode(frame).part()
+            if not live:
+                live = timer.sent()
+            # The server writes the part to the socket before resuming us
+            started = time.monotonic()
+            yield part
+            hub.write_seconds.observe(time.monotonic() - started)
+            hub.bytes_sent.inc(len(part))
+    except GeneratorExit:
+        logger.info("Client disconnected. Closing stream.")
+    except Exception as e:
+        logger.error(f"Error in stream: {e}")
+    finally:
+        subscriber.close()
+
+
+def stream_camera_feed(camera, width=None, max_fps=None, quality=DEFAULT_JPEG_QUALITY, started=None):
+    """
+    Streams the video feed from the camera, scaled down to width, capped at
+    max_fps and encoded at the given JPEG quality.
+    """
+    try:
+        timer = StreamTimer(f"camera {camera.id}", started)
+
+        # Small tiles are decoded from the sub-stream
+        profile = Camera.profile_for_width(width)
+        camera_url = camera.stream_url(profile)
+
+        # Offline cameras turn new viewers away without an RTSP open
+        supervisor = get_supervisor(camera.id)
+        supervisor.check()
+
+        # New streams wait for, or are turned away without, decode and
+        # encode capacity on this node
+        admission.admit(camera.id, profile, quality, width)
+
+        # A recent frame is shown at once while the live stream starts
+        first = cached_frame(camera.id, profile, quality, width)
 
+        # Viewers joining a camera that is already decoding, or that have a
+        # recent frame to look at meanwhile, skip the probe
+        if (
+            first is None
+            and get_running_hub(camera.id, profile) is None
+            and not ingest_available(camera.id, profile)
+        ):
+            logger.info(f"Checking camera connection at {camera_url}")
+
+            # Check if the camera is active
+            if not check_camera_status(camera_url, **camera.capture_options()):
+                supervisor.record_failure()
+                admission.cancel(camera.id, profile)
+                logger.error(f"Unable to connect to the camera feed at {camera_url}")
+                return None
+            supervisor.record_success()
+
+        # Stream the video as MJPEG
         return StreamingHttpResponse(
-            generate(),
+            generate_mjpeg(
+                lambda: subscribe(camera, profile, max_fps=max_fps, quality=quality, width=width),
+                first,
+                timer,
+            ),
             content_type="multipart/x-mixed-replace; boundary=frame"
         )
     
+    except (CameraOffline, StreamRejected):
+        raise
     except Exception as e:
         logger.error(f"Error while streaming camera feed: {str(e)}")
         return None
@@ -318,13 +502,45 @@ class CameraStreamView(APIView):
     """
     APIView for streaming camera feeds by Camera ID.
     """
+    @swagger_auto_schema(
+        operation_description="Stream a camera as MJPEG, optionally scaled, rate-capped and re-compressed.",
+        manual_parameters=[
+            openapi.Parameter(
+                'width', openapi.IN_QUERY,
+                description="Scale frames down to this width in pixels, keeping the aspect ratio",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+            openapi.Parameter(
+                'max_fps', openapi.IN_QUERY,
+                description="Maximum frames per second to send",
+                type=openapi.TYPE_NUMBER,
+                required=False
+            ),
+            openapi.Parameter(
+                'quality', openapi.IN_QUERY,
+                description="JPEG quality from 1 to 100",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+        ]
+    )
     def get(self, request, pk=None):
+        started = time.monotonic()
+        try:
+            options = parse_stream_options(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"message": str(e), "status": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             # Fetch the camera instance based on its ID
             camera = Camera.objects.get(pk=pk)
 
             # Stream the camera feed
-            stream = stream_camera_feed(camera)
+            stream = stream_camera_feed(camera, started=started, **options)
             if stream is not None:
                 return stream
             else:
@@ -337,6 +553,18 @@ class CameraStreamView(APIView):
                 {"message": "Camera not found.", "status": status.HTTP_404_NOT_FOUND},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except CameraOffline as e:
+            return Response(
+                {"message": "Camera is offline.", "status": status.HTTP_503_SERVICE_UNAVAILABLE},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        except StreamRejected as e:
+            return Response(
+                {"message": "Too many streams on this server, try again later.", "status": status.HTTP_503_SERVICE_UNAVAILABLE},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
         except Exception as e:
             logger.error(f"Unexpected error in streaming camera feed: {e}")
             return Response(
@@ -344,6 +572,532 @@ class CameraStreamView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def take_snapshot(camera, quality=DEFAULT_JPEG_QUALITY, width=None):
+    """
+    Return a recent encoded frame of the camera. A running hub or a recent
+    snapshot is used when available; only a cold miss opens a capture.
+    Returns None if the camera could not be read.
+    """
+    profile = Camera.profile_for_width(width)
+    for candidate in dict.fromkeys((profile, Camera.MAIN_STREAM)):
+        hub = get_running_hub(camera.id, candidate)
+        frame = hub.latest if hub is not None else None
+        if frame is not None and time.time() - frame.timestamp <= SNAPSHOT_MAX_AGE:
+            return hub.encode(frame, quality, width)
+
+    encoded = recent_snapshot(camera.id, SNAPSHOT_MAX_AGE, quality, width)
+    if encoded is not None:
+        return encoded
+
+    # Cold miss: read one frame from the ingest daemon or through the pool,
+    # which keeps the session warm
+    supervisor = get_supervisor(camera.id)
+    supervisor.check()
+    cap = open_stream_capture(camera, profile)
+    try:
+        ret, image = cap.read() if cap.isOpened() else (False, None)
+        if ret:
+            encoded = encode_frame(Frame(0, image, time.time()), quality, width)
+    finally:
+        release_stream_capture(camera, profile, cap)
+    if not ret:
+        supervisor.record_failure()
+        logger.error(f"Unable to read a snapshot from camera {camera.id}")
+        return None
+    supervisor.record_success()
+    store_snapshot(camera.id, encoded, quality, width)
+    return encoded
+
+
+def snapshot_response(request, encoded):
+    """
+    Build a cacheable JPEG response for a snapshot, answering conditional
+    requests with 304 Not Modified.
+    """
+    age = max(0, time.time() - encoded.timestamp)
+    etag = f'"{int(encoded.timestamp * 1000):x}-{encoded.seq}"'
+    last_modified = int(encoded.timestamp)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(',')]
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        not_modified = since is not None and last_modified <= since
+
+    if not_modified:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(encoded.jpeg, content_type='image/jpeg')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = f"max-age={int(max(0, SNAPSHOT_MAX_AGE - age))}"
+    return response
+
+
+class CameraSnapshotView(APIView):
+    """
+    APIView for a still JPEG of a camera, served from the live frame cache.
+    """
+    @swagger_auto_schema(
+        operation_description="Latest still image of a camera, cacheable by browsers and proxies.",
+        manual_parameters=[
+            openapi.Parameter(
+                'width', openapi.IN_QUERY,
+                description="Scale the image down to this width in pixels, keeping the aspect ratio",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+            openapi.Parameter(
+                'quality', openapi.IN_QUERY,
+                description="JPEG quality from 1 to 100",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+        ]
+    )
+    def get(self, request, pk=None):
+        try:
+            options = parse_stream_options(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"message": str(e), "status": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        options.pop('max_fps', None)
+
+        try:
+            camera = Camera.objects.get(pk=pk)
+            encoded = take_snapshot(camera, **options)
+            if encoded is None:
+                return Response(
+                    {"message": "Unable to read from the camera.", "status": status.HTTP_500_INTERNAL_SERVER_ERROR},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            return snapshot_response(request, encoded)
+        except Camera.DoesNotExist:
+            return Response(
+                {"message": "Camera not found.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except CameraOffline as e:
+            return Response(
+                {"message": "Camera is offline.", "status": status.HTTP_503_SERVICE_UNAVAILABLE},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        except Exception as e:
+            logger.error(f"Unexpected error in camera snapshot: {e}")
+            return Response(
+                {"message": "An unexpected error occurred.", "status": status.HTTP_500_INTERNAL_SERVER_ERROR},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+def parse_replay_options(query_params):
+    """
+    Read the since and speed query parameters of a replay request as
+    (seconds back from now, playback speed). Raises ValueError with a
+    client-facing message if either is invalid.
+    """
+    match = REPLAY_SINCE_PATTERN.match(query_params.get('since') or '-60s')
+    if match is None:
+        raise ValueError("since must be an offset such as -60s or -2m.")
+    seconds = float(match.group(1)) * (60 if match.group(2) == 'm' else 1)
+
+    speed = query_params.get('speed') or 1
+    try:
+        speed = float(speed)
+    except ValueError:
+        raise ValueError("speed must be a number.")
+    low, high = REPLAY_SPEED_RANGE
+    if not low <= speed <= high:
+        raise ValueError(f"speed must be between {low} and {high}.")
+    return seconds, speed
+
+
+def generate_replay(frames, speed):
+    """
+    Yield multipart MJPEG parts for recorded (timestamp, jpeg) frames,
+    spaced as they were captured, sped up by speed.
+    """
+    started = time.monotonic()
+    first = None
+    try:
+        for timestamp, jpeg in frames:
+            if first is None:
+                first = timestamp
+            delay = started + (timestamp - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield mjpeg_part(jpeg, timestamp=timestamp, sent_at=time.time())
+    except GeneratorExit:
+        logger.info("Client disconnected. Closing replay.")
+
+
+class CameraReplayView(APIView):
+    """
+    APIView replaying the recent past of a camera from its rolling buffer,
+    without opening the camera.
+    """
+    @swagger_auto_schema(
+        operation_description="Replay the last seconds of a camera as an MJPEG stream.",
+        manual_parameters=[
+            openapi.Parameter(
+                'since', openapi.IN_QUERY,
+                description="How far back to start, e.g. -60s or -2m (default -60s)",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                'speed', openapi.IN_QUERY,
+                description="Playback speed; 1 plays at the original pace",
+                type=openapi.TYPE_NUMBER,
+                required=False
+            ),
+        ]
+    )
+    def get(self, request, pk=None):
+        try:
+            seconds, speed = parse_replay_options(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"message": str(e), "status": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not Camera.objects.filter(pk=pk).exists():
+            return Response(
+                {"message": "Camera not found.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        replay = find_buffer(pk)
+        frames = replay.frames_since(time.time() - seconds) if replay is not None else iter(())
+        first = next(frames, None)
+        if first is None:
+            return Response(
+                {"message": "No recorded frames for this camera.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return StreamingHttpResponse(
+            generate_replay(itertools.chain([first], frames), speed),
+            content_type="multipart/x-mixed-replace; boundary=frame"
+        )
+
+
+def collect_metric_samples():
+    """
+    Values read from live objects at scrape time, as (name, type, labels,
+    value) samples for render_prometheus().
+    """
+    samples = []
+    for hub in running_hubs():
+        samples.append(('stream_viewers', 'gauge', hub.labels, len(hub.subscribers)))
+        if isinstance(hub, CameraHub):
+            samples.append(('camera_decode_fps', 'gauge', hub.labels, round(hub.decode_fps, 2)))
+            samples.append(('stream_degradation_level', 'gauge', hub.labels, hub.level))
+    for supervisor in all_supervisors():
+        labels = {'camera': supervisor.camera_id}
+        stats = supervisor.stats()
+        samples.append(('camera_offline', 'gauge', labels, int(stats['offline'])))
+        samples.append(('camera_reconnects_total', 'counter', labels, stats['reconnect_attempts']))
+        samples.append(('camera_circuit_opens_total', 'counter', labels, stats['circuit_opens']))
+    for replay in all_buffers():
+        labels = {'camera': replay.camera_id}
+        stats = replay.stats()
+        samples.append(('replay_buffer_frames', 'gauge', labels, stats['frames']))
+        samples.append(('replay_buffer_ram_bytes', 'gauge', labels, stats['ram_bytes']))
+        samples.append(('replay_buffer_disk_bytes', 'gauge', labels, stats['disk_bytes']))
+
+    pool = capture_pool.stats()
+    samples.append(('capture_pool_idle', 'gauge', {}, pool['idle']))
+    for name in ('hits', 'misses', 'evictions'):
+        samples.append((f'capture_pool_{name}_total', 'counter', {}, pool[name]))
+    samples.append(('encode_queue_depth', 'gauge', {}, encode_pool.queue_depth()))
+    capacity = admission.stats()
+    samples.append(('decoders_in_use', 'gauge', {}, capacity['decoders_in_use']))
+    samples.append(('decoders_max', 'gauge', {}, capacity['max_decoders']))
+    samples.append(('encode_load', 'gauge', {}, capacity['encode_load']))
+    samples.append(('encode_load_max', 'gauge', {}, capacity['max_encode_load']))
+    samples.append(('stream_admission_waiting', 'gauge', {}, capacity['waiting']))
+    load = governor.stats()
+    samples.append(('governor_cpu', 'gauge', {}, load['cpu']))
+    for priority, level in sorted(load['levels'].items()):
+        samples.append(('governor_level', 'gauge', {'priority': priority}, level))
+    samples.append(('encode_completed_total', 'counter', {}, encode_pool.completed))
+    lifecycle = lifecycle_stats()
+    for name in ('cold_starts', 'warm_hits', 'joins', 'reaped', 'abandoned_viewers'):
+        samples.append((f'hub_{name}_total', 'counter', {}, lifecycle[name]))
+    samples.append(('hub_running', 'gauge', {}, lifecycle['running_hubs']))
+    return samples
+
+
+def _metric_key(name):
+    # camera_read_seconds -> read, stream_bytes_sent_total -> bytes_sent
+    for prefix in ('camera_', 'stream_'):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    for suffix in ('_seconds', '_total'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def camera_metrics(camera_id):
+    """
+    Per-stage timings and counters of a camera's streams, keyed by profile.
+    """
+    streams = {}
+    for name, labels, found in histograms():
+        if labels.get('camera') == camera_id and found.count:
+            p50, p99 = found.quantile(0.5), found.quantile(0.99)
+            streams.setdefault(labels['profile'], {})[f"{_metric_key(name)}_ms"] = {
+                "count": found.count,
+                "mean": round(found.sum / found.count * 1000, 3),
+                "p50": None if p50 == float('inf') else p50 * 1000,
+                "p99": None if p99 == float('inf') else p99 * 1000,
+            }
+    for name, labels, found in counters():
+        if labels.get('camera') == camera_id:
+            streams.setdefault(labels['profile'], {})[_metric_key(name)] = found.value
+    for hub in running_hubs():
+        if isinstance(hub, CameraHub) and hub.camera_id == camera_id:
+            stream = streams.setdefault(hub.profile, {})
+            stream["viewers"] = len(hub.subscribers)
+            stream["decode_fps"] = round(hub.decode_fps, 2)
+            stream["degradation_level"] = hub.level
+            stream["limits"] = hub.limits
+
+    replay = find_buffer(camera_id)
+    return {
+        "camera_id": camera_id,
+        "streams": streams,
+        "supervisor": get_supervisor(camera_id).stats(),
+        "replay": replay.stats() if replay is not None else None,
+    }
+
+
+class MetricsView(APIView):
+    """
+    APIView exposing every stream metric in the Prometheus text format.
+    """
+    @swagger_auto_schema(
+        operation_description="Stream pipeline metrics in the Prometheus text exposition format."
+    )
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(collect_metric_samples()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
+class CameraMetricsView(APIView):
+    """
+    APIView with the stream pipeline metrics of one camera.
+    """
+    @swagger_auto_schema(
+        operation_description="Per-stage timings, frame rates and counters of a camera's streams."
+    )
+    def get(self, request, pk=None):
+        if not Camera.objects.filter(pk=pk).exists():
+            return Response(
+                {"message": "Camera not found.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"results": camera_metrics(pk), "status": status.HTTP_200_OK})
+
+
+class MosaicStreamView(APIView):
+    """
+    APIView streaming every camera of a machine or cluster as one MJPEG
+    mosaic. kind is set to 'machine' or 'cluster' in the URL conf.
+    """
+    kind = None
+
+    @swagger_auto_schema(
+        operation_description="Stream all cameras of a machine or cluster tiled into a single MJPEG stream.",
+        manual_parameters=[
+            openapi.Parameter(
+                'width', openapi.IN_QUERY,
+                description="Width of each tile in pixels",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+            openapi.Parameter(
+                'max_fps', openapi.IN_QUERY,
+                description="Frames per second the mosaic is composed at",
+                type=openapi.TYPE_NUMBER,
+                required=False
+            ),
+            openapi.Parameter(
+                'quality', openapi.IN_QUERY,
+                description="JPEG quality from 1 to 100",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+        ]
+    )
+    def get(self, request, pk=None):
+        try:
+            options = parse_stream_options(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"message": str(e), "status": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if self.kind == 'cluster':
+            owner = Cluster.objects.filter(pk=pk).first()
+            cameras = list(Camera.objects.filter(machine__cluster_id=pk).order_by('id'))
+        else:
+            owner = Machine.objects.filter(pk=pk).first()
+            cameras = list(Camera.objects.filter(machine_id=pk).order_by('id'))
+        if owner is None:
+            return Response(
+                {"message": f"{self.kind.capitalize()} not found.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if not cameras:
+            return Response(
+                {"message": f"No cameras found for this {self.kind}.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return StreamingHttpResponse(
+            generate_mjpeg(lambda: subscribe_mosaic(
+                self.kind, owner, cameras,
+                tile_width=options.get('width'),
+                max_fps=options.get('max_fps'),
+                quality=options.get('quality', DEFAULT_JPEG_QUALITY),
+            )),
+            content_type="multipart/x-mixed-replace; boundary=frame"
+        )
+
+
+class AsyncCameraStreamView(View):
+    """
+    Async view for streaming camera feeds by Camera ID under ASGI.
+    Waiting viewers hold no thread: encodes are awaited on the shared encode
+    pool and probe calls run on the bounded stream executor.
+    """
+    async def get(self, request, pk=None):
+        timer = StreamTimer(f"camera {pk}")
+        try:
+            options = parse_stream_options(request.GET)
+        except ValueError as e:
+            return JsonResponse(
+                {"message": str(e), "status": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            camera = await Camera.objects.aget(pk=pk)
+        except Camera.DoesNotExist:
+            return JsonResponse(
+                {"message": "Camera not found.", "status": status.HTTP_404_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        loop = asyncio.get_running_loop()
+        profile = Camera.profile_for_width(options.get('width'))
+        camera_url = camera.stream_url(profile)
+
+        # Offline cameras turn new viewers away without an RTSP open
+        supervisor = get_supervisor(camera.id)
+        if not supervisor.allow_attempt():
+            response = JsonResponse(
+                {"message": "Camera is offline.", "status": status.HTTP_503_SERVICE_UNAVAILABLE},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response["Retry-After"] = str(math.ceil(supervisor.retry_after()))
+            return response
+
+        # New streams wait for, or are turned away without, decode and
+        # encode capacity on this node
+        try:
+            await admission.admit_async(
+                camera.id, profile, options.get('quality', DEFAULT_JPEG_QUALITY), options.get('width')
+            )
+        except StreamRejected as e:
+            response = JsonResponse(
+                {"message": "Too many streams on this server, try again later.", "status": status.HTTP_503_SERVICE_UNAVAILABLE},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response["Retry-After"] = str(math.ceil(e.retry_after))
+            return response
+
+        # A recent frame is shown at once while the live stream starts
+        first = await loop.run_in_executor(
+            stream_executor,
+            functools.partial(
+                cached_frame, camera.id, profile,
+                options.get('quality', DEFAULT_JPEG_QUALITY), options.get('width'),
+            )
+        )
+
+        # Viewers joining a camera that is already decoding, or that have a
+        # recent frame to look at meanwhile, skip the probe
+        if (
+            first is None
+            and get_running_hub(camera.id, profile) is None
+            and not ingest_available(camera.id, profile)
+        ):
+            logger.info(f"Checking camera connection at {camera_url}")
+            is_active = await loop.run_in_executor(
+                stream_executor,
+                functools.partial(check_camera_status, camera_url, **camera.capture_options())
+            )
+            if is_active:
+                supervisor.record_success()
+            else:
+                supervisor.record_failure()
+                admission.cancel(camera.id, profile)
+                logger.error(f"Unable to connect to the camera feed at {camera_url}")
+                return JsonResponse(
+                    {"message": "Unable to stream the camera feed.", "status": status.HTTP_500_INTERNAL_SERVER_ERROR},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+
+        async def generate():
+            subscriber = subscribe(camera, profile, **options)
+            hub = subscriber.hub
+            try:
+                if first is not None:
+                    timer.sent(cached=True)
+                    part = first.part()
+                    yield part
+                    hub.bytes_sent.inc(len(part))
+
+                live = False
+                while True:
+                    try:
+                        frame = await subscriber.get_async(timeout=FRAME_WAIT_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        continue
+
+                    encoded = await asyncio.wrap_future(subscriber.request_encode(frame))
+                    if not live:
+                        live = timer.sent()
+                    part = encoded.part()
+                    started = time.monotonic()
+                    yield part
+                    hub.write_seconds.observe(time.monotonic() - started)
+                    hub.bytes_sent.inc(len(part))
+            except asyncio.CancelledError:
+                logger.info("Client disconnected. Closing stream.")
+                raise
+            except Exception as e:
+                logger.error(f"Error in stream: {e}")
+            finally:
+                subscriber.close()
+
+        return StreamingHttpResponse(
+            generate(),
+            content_type="multipart/x-mixed-replace; boundary=frame"
+        )
+
 #############################################################################################################################################
     
 
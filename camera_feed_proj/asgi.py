@@ -1,51 +1,36 @@
-# import os
-# import django
+"""
+ASGI config for camera_feed_proj project.
 
-# # Set the DJANGO_SETTINGS_MODULE before any Django imports
-# os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_feed_proj.settings')
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serving the project over ASGI lets camera streams use the async stream view,
+which holds no worker thread per viewer, and the WebSocket stream.
 
-# # Ensure Django is setup before using any Django components
-# django.setup()
+For more information on this file, see
+https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+"""
 
-# from channels.routing import ProtocolTypeRouter, URLRouter
-# from channels.auth import AuthMiddlewareStack
-# import camera_feed_app.routing
-# from django.core.asgi import get_asgi_application
+import os
 
-# application = ProtocolTypeRouter({
-#     "http": get_asgi_application(),  # Handles HTTP requests as usual.
-#     "websocket": AuthMiddlewareStack(
-#         URLRouter(
-#             camera_feed_app.routing.websocket_urlpatterns
-#         )
-#     ),
-# })
+from django.core.asgi import get_asgi_application
 
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_feed_proj.settings')
 
+# Set up Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
 
+# Stop idle camera hubs and keep the keep-warm cameras decoding
+from camera_feed_app import governor, reaper
+reaper.start()
+governor.start()
 
-# asgi.py
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
+import camera_feed_app.routing
 
-# import os
-# import django
-
-# # Set the DJANGO_SETTINGS_MODULE before any Django imports
-# os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_feed_proj.settings')
-
-# # Ensure Django is setup before using any Django components
-# django.setup()
-
-# from channels.routing import ProtocolTypeRouter, URLRouter
-# from channels.auth import AuthMiddlewareStack
-# from django.urls import path
-# from camera_feed_app import consumers
-# from django.core.asgi import get_asgi_application
-
-# application = ProtocolTypeRouter({
-#     "http": get_asgi_application(),
-#     "websocket": AuthMiddlewareStack(
-#         URLRouter([
-#             path("ws/camera/<int:camera_id>/stream/", consumers.CameraStreamConsumer.as_asgi()),
-#         ])
-#     ),
-# })
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": AuthMiddlewareStack(
+        URLRouter(camera_feed_app.routing.websocket_urlpatterns)
+    ),
+    "channel": ChannelNameRouter(camera_feed_app.routing.channel_routes),
+})
@@ -46,7 +46,7 @@ ALLOWED_HOSTS = ['*','localhost', '127.0.0.1', 'cctv.indusvision.in', 'www.cctv.
 
 INSTALLED_APPS = [
 
-    # 'daphne',
+    'daphne',
 
     'django.contrib.admin',
     'django.contrib.auth',
@@ -59,6 +59,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'drf_yasg',
     'corsheaders',
+    'channels',
 ]
 
 MIDDLEWARE = [
@@ -91,7 +92,7 @@ TEMPLATES = [
 ]
 
 
-# ASGI_APPLICATION = 'camera_feed_proj.asgi.application'
+ASGI_APPLICATION = 'camera_feed_proj.asgi.application'
 
 
 WSGI_APPLICATION = 'camera_feed_proj.wsgi.application'
@@ -115,11 +116,29 @@ REST_FRAMEWORK = {
     ],
 }
 
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels.layers.InMemoryChannelLayer',  # This uses Redis for Channels layer
-#     }
-# }
+# Redis carries WebSocket frames between processes when CHANNEL_REDIS_URL is
+# set; otherwise an in-memory layer is used (single process, and tests)
+CHANNEL_REDIS_URL = os.environ.get('CHANNEL_REDIS_URL')
+
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [CHANNEL_REDIS_URL],
+                'capacity': 8,  # Frames queued per client before new ones are dropped
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {
+                'capacity': 8,
+            },
+        }
+    }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=2),
@@ -164,6 +183,74 @@ SIMPLE_JWT = {
 AUTH_USER_MODEL = 'users.User'
 
 
+# Camera streaming
+# One capture hub per camera is shared by every viewer of that camera.
+
+CAMERA_JPEG_QUALITY = 95  # Default JPEG quality for streamed frames
+CAMERA_CAPTURE_POOL_SIZE = 8  # Idle RTSP captures kept open for reuse
+CAMERA_CAPTURE_IDLE_SECONDS = 10  # How long an idle capture stays warm
+CAMERA_CAPTURE_BUFFER_SIZE = 1  # Frames a capture may queue; small keeps delivered frames fresh
+CAMERA_SUB_STREAM_MAX_WIDTH = 640  # Requests at or below this width use the sub-stream
+CAMERA_STREAM_EXECUTOR_WORKERS = 8  # Threads for blocking probe calls in async streams
+CAMERA_ENCODE_WORKERS = None  # JPEG encoder threads; None uses one per core
+CAMERA_RECONNECT_BASE_DELAY = 0.5  # First reconnect delay in seconds, doubled per failure
+CAMERA_RECONNECT_MAX_DELAY = 30  # Cap on the reconnect delay in seconds
+CAMERA_CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures before a camera is marked offline
+CAMERA_CIRCUIT_RESET_SECONDS = 30  # How long an offline camera turns new viewers away
+CAMERA_LOG_INTERVAL_SECONDS = 30  # Minimum gap between repeated reconnect warnings
+CAMERA_HUB_LINGER_SECONDS = 30  # Seconds a hub keeps running after its last viewer left
+CAMERA_SUBSCRIBER_TIMEOUT = 60  # Viewers that leave a frame unread this long are detached
+CAMERA_KEEP_WARM = {'cameras': [], 'machines': [], 'clusters': []}  # Decoded even without viewers
+CAMERA_KEEP_WARM_FPS = 1  # Frames per second converted by hubs without viewers
+CAMERA_REAP_INTERVAL = 5  # Seconds between two sweeps for idle hubs
+CAMERA_KEEP_WARM_RELOAD_SECONDS = 30  # How often the keep-warm cameras are reloaded
+CAMERA_SNAPSHOT_MAX_AGE = 2  # Seconds a snapshot may be served from cache
+CAMERA_FIRST_FRAME_MAX_AGE = 10  # Oldest cached frame shown to a new viewer while the stream starts
+CAMERA_CHANGE_THRESHOLD = 2.0  # Mean grey-level difference that counts as a scene change; 0 disables
+CAMERA_CHANGE_SAMPLE_WIDTH = 64  # Width of the grayscale thumbnail scenes are compared on
+CAMERA_STATIC_KEEPALIVE_SECONDS = 1  # How often viewers of a static scene get a repeat frame
+CAMERA_DVR_SECONDS = 60  # Seconds of recent video kept per camera for replay; 0 disables
+CAMERA_DVR_FPS = 5  # Frames per second recorded for replay
+CAMERA_DVR_QUALITY = 80  # JPEG quality of recorded frames
+CAMERA_DVR_WIDTH = 1280  # Width of recorded frames; None keeps the camera's
+CAMERA_DVR_MAX_BYTES = 32 * 1024 * 1024  # RAM per camera before older frames spill to disk
+CAMERA_DVR_MAX_DISK_BYTES = 256 * 1024 * 1024  # Spilled bytes kept per camera
+CAMERA_DVR_SEGMENT_BYTES = 16 * 1024 * 1024  # Size of one memory-mapped spill file
+CAMERA_DVR_SPILL_DIR = None  # Directory for spill files; None uses the system temp directory
+CAMERA_HEALTH_MONITOR = True  # Probe cameras in the background for the status API
+CAMERA_HEALTH_INTERVAL = 30  # Seconds between two probes of the same camera
+CAMERA_HEALTH_CONCURRENCY = 16  # Health probes in flight at once
+CAMERA_HEALTH_TIMEOUT = 5  # Seconds before a probe counts the camera as offline
+CAMERA_HEALTH_DESCRIBE = True  # Health probes also DESCRIBE the stream, checking credentials
+CAMERA_RTSP_PROBE_TIMEOUT = 3  # Default seconds an RTSP OPTIONS/DESCRIBE probe may take
+CAMERA_MOSAIC_TILE_WIDTH = 320  # Default tile width of machine and cluster mosaics
+CAMERA_MOSAIC_FPS = 5  # Default frame rate of machine and cluster mosaics
+CAMERA_MOSAIC_MAX_TILES = 36  # Most cameras tiled into one mosaic
+CAMERA_WS_PUBLISHER_CHANNEL = 'camera-publisher'  # Worker channel for `manage.py runworker camera-publisher`
+CAMERA_WS_WATCH_INTERVAL = 5  # Seconds between lease renewals from WebSocket clients
+CAMERA_WS_PUBLISH_IN_PROCESS = not CHANNEL_REDIS_URL  # Publish frames from the web process itself
+CAMERA_INGEST_MODE = os.environ.get('CAMERA_INGEST_MODE', 'local')  # 'shared_memory' to read frames from `manage.py run_ingest`
+CAMERA_INGEST_PROFILES = ['main']  # Streams the ingest daemon decodes for every camera
+CAMERA_INGEST_RELOAD_SECONDS = 30  # How often the ingest daemon picks up camera changes
+CAMERA_SHM_SLOTS = 8  # Frames kept per shared memory ring
+CAMERA_MAX_DECODERS = 4 * (os.cpu_count() or 1)  # Camera streams decoded at once per process; None for no limit
+CAMERA_MAX_ENCODE_LOAD = 0.9  # Encode pool busy share past which new stream variants are refused; None for no limit
+CAMERA_ADMISSION_QUEUE_SECONDS = 5  # How long a new stream waits for capacity before a 503
+CAMERA_ADMISSION_QUEUE_SIZE = 16  # New streams waiting at once; more get a 503 straight away
+CAMERA_ADMISSION_RETRY_AFTER = 10  # Retry-After seconds sent with a capacity 503
+CAMERA_GOVERNOR = True  # Step stream fps, width and quality down under load and back up after
+CAMERA_GOVERNOR_INTERVAL = 2  # Seconds between two load samples and steps
+CAMERA_GOVERNOR_CPU_HIGH = 0.85  # Process CPU share of all cores that triggers a step down
+CAMERA_GOVERNOR_CPU_LOW = 0.6  # Process CPU share below which streams are stepped back up
+CAMERA_GOVERNOR_QUEUE_HIGH = 2  # Queued encodes per encode worker that trigger a step down
+CAMERA_GOVERNOR_STEPS = [  # Caps per step down, mildest first; lower-priority clusters step first
+    {'max_fps': 15},
+    {'max_fps': 10, 'max_quality': 80},
+    {'max_fps': 5, 'max_quality': 70, 'max_width': 1280},
+    {'max_fps': 2, 'max_quality': 60, 'max_width': 640},
+]
+
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_feed_proj.settings')
 
 application = get_wsgi_application()
+
+# Stop idle camera hubs and keep the keep-warm cameras decoding
+from camera_feed_app import governor, reaper
+reaper.start()
+governor.start()